@@ -0,0 +1,86 @@
+
+from flask import Flask
+from models import db
+from db_config import configure_database
+from sqlalchemy import inspect, text
+
+app = Flask(__name__)
+configure_database(app)
+
+db.init_app(app)
+
+def merge_duplicate_cart_items(conn):
+    """Fold duplicate (user_id, product_id) cart rows into one before the unique index is added"""
+    inspector = inspect(conn)
+    if not inspector.has_table('cart_items'):
+        return
+    if 'uq_cart_items_user_id_product_id' in {index['name'] for index in inspector.get_indexes('cart_items')}:
+        return
+
+    # Keep the oldest row of each duplicate group with the summed quantity
+    conn.execute(text("""
+        UPDATE cart_items c
+        JOIN (
+            SELECT MIN(id) AS keep_id, SUM(quantity) AS total_quantity
+            FROM cart_items
+            GROUP BY user_id, product_id
+            HAVING COUNT(*) > 1
+        ) d ON c.id = d.keep_id
+        SET c.quantity = d.total_quantity
+    """))
+    result = conn.execute(text("""
+        DELETE c FROM cart_items c
+        JOIN (
+            SELECT user_id, product_id, MIN(id) AS keep_id
+            FROM cart_items
+            GROUP BY user_id, product_id
+            HAVING COUNT(*) > 1
+        ) d ON c.user_id = d.user_id AND c.product_id = d.product_id AND c.id <> d.keep_id
+    """))
+    if result.rowcount:
+        print(f"Merged {result.rowcount} duplicate cart item row(s)")
+
+def create_missing_indexes(conn):
+    """Create every index declared on the models that the database lacks.
+
+    Safe to run repeatedly: indexes that already exist are left alone.
+    Returns the names of the indexes that were created.
+    """
+    inspector = inspect(conn)
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            print(f"Skipping {table.name}: table does not exist yet")
+            continue
+
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in existing:
+                print(f"Index {index.name} already exists on {table.name}")
+                continue
+
+            index.create(bind=conn)
+            created.append(index.name)
+            print(f"Created index {index.name} on {table.name}")
+
+    return created
+
+def add_indexes():
+    """Add the secondary indexes declared in models.py to an existing database"""
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                merge_duplicate_cart_items(conn)
+                created = create_missing_indexes(conn)
+                conn.commit()
+
+            print(f"Index migration completed! {len(created)} index(es) created.")
+            return True
+        except Exception as e:
+            print(f"Error adding indexes: {str(e)}")
+            return False
+
+if __name__ == '__main__':
+    add_indexes()
@@ -1,11 +1,11 @@
 
 from flask import Flask
 from models import db, Message
+from db_config import configure_database
 from sqlalchemy import text
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root:@localhost/kukuhub'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+configure_database(app)
 
 db.init_app(app)
 
@@ -1,18 +1,30 @@
-from flask import Flask, request, jsonify, session, make_response
+from flask import Flask, Response, request, jsonify, session
 from flask_cors import CORS
 from models import db, User, SellerProfile, AdminProfile, Product, Message, CartItem, Order, OrderItem
+from db_config import configure_database
+from metrics import render_metrics
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
 import os
-from app_auth import check_admin_auth, check_seller_auth
+from app_auth import check_admin_auth, check_seller_auth, current_admin, current_seller
 from routes.mpesa import mpesa_routes
+from routes.media import media_routes
+from pagination import get_page_limit, paginate_keyset
+from queries import products_with_seller, cart_items_with_products, orders_with_user, load_order_items, search_products, count_unread_messages
+from reports import stream_csv_report, report_query
+from stats import get_dashboard_stats
+from cart import add_to_cart, set_cart_quantity, remove_from_cart
+from facets import product_added, product_changed, product_removed, get_product_facets
+from http_cache import catalogue_version, make_etag, not_modified, with_cache_headers
+from response_cache import product_list_key, product_detail_key, get_cached_response, cache_response
+from events import broker, event_stream, seller_channel, buyer_channel
+from media_store import MediaRequest, MediaError, MAX_REQUEST_BYTES, IMAGE_TYPES, VIDEO_TYPES, store_upload, media_url, queue_image_variants, image_fields
 import uuid
-import csv
-import io
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root:@localhost/kukuhub'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+configure_database(app)
 app.secret_key = 'your_secret_key'  # Change this to a secure key in production
 
 # Configure upload folder for product images
@@ -21,11 +33,21 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Stream uploads into the media store instead of buffering them
+app.request_class = MediaRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+
 CORS(app, supports_credentials=True)
 db.init_app(app)
 
 # Register blueprints
 app.register_blueprint(mpesa_routes, url_prefix='/api/mpesa')
+app.register_blueprint(media_routes)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Expose this worker's metrics in the Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 # User registration and authentication routes
 @app.route('/api/register', methods=['POST'])
@@ -159,21 +181,7 @@ def seller_login():
 
 @app.route('/api/seller/check-auth', methods=['GET'])
 def seller_auth_check():
-    if 'seller_id' in session:
-        seller_id = session['seller_id']
-        seller = db.session.get(SellerProfile, seller_id)  # Using modern SQLAlchemy method
-        
-        if seller:
-            return jsonify({
-                'isAuthenticated': True,
-                'seller_id': seller.seller_id,
-                'username': seller.username,
-                'email': seller.email,
-                'business_name': seller.business_name,
-                'approval_status': seller.approval_status
-            })
-    
-    return jsonify({'isAuthenticated': False})
+    return check_seller_auth()
 
 # Admin routes
 @app.route('/api/admin/login', methods=['POST'])
@@ -211,58 +219,13 @@ def admin_dashboard_stats():
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
     try:
-        # Get counts from database with detailed logging
-        print("Fetching dashboard stats...")
-        
-        # Check database connection
-        print("Checking database connection...")
-        
-        # Get counts with detailed logging
-        total_products = Product.query.count()
-        print(f"Products query result: {total_products}")
-        
-        total_users_buyers = User.query.count()
-        print(f"Buyers count: {total_users_buyers}")
-        
-        total_users_sellers = SellerProfile.query.count()
-        print(f"Sellers count: {total_users_sellers}")
-        
-        total_users = total_users_buyers + total_users_sellers
-        print(f"Total users: {total_users}")
-        
-        total_orders = Order.query.count()
-        print(f"Orders count: {total_orders}")
-        
-        # Also check if we can fetch some sample data
-        sample_users = User.query.limit(5).all()
-        print(f"Sample users found: {len(sample_users)}")
-        for user in sample_users:
-            print(f"User: {user.username} - {user.email}")
-        
-        sample_sellers = SellerProfile.query.limit(5).all()
-        print(f"Sample sellers found: {len(sample_sellers)}")
-        for seller in sample_sellers:
-            print(f"Seller: {seller.username} - {seller.email}")
-        
-        sample_products = Product.query.limit(5).all()
-        print(f"Sample products found: {len(sample_products)}")
-        for product in sample_products:
-            print(f"Product: {product.name} - Price: {product.price}")
-        
-        sample_orders = Order.query.limit(5).all()
-        print(f"Sample orders found: {len(sample_orders)}")
-        for order in sample_orders:
-            print(f"Order: {order.order_id} - Total: {order.total}")
-        
-        print(f"Final dashboard stats - Products: {total_products}, Users: {total_users}, Orders: {total_orders}")
+        # Counts come from one aggregate query, cached briefly and
+        # invalidated whenever products, users, sellers or orders change
+        stats = get_dashboard_stats()
         
         return jsonify({
             'success': True,
-            'stats': {
-                'products': total_products,
-                'users': total_users,
-                'orders': total_orders
-            }
+            'stats': stats
         })
     
     except Exception as e:
@@ -275,10 +238,9 @@ def admin_dashboard_stats():
 def admin_get_users():
     """Get all users and sellers for admin"""
     # First check if admin is authenticated
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
     try:
@@ -322,30 +284,58 @@ def admin_get_users():
 
 @app.route('/api/admin/orders', methods=['GET'])
 def admin_get_orders():
-    """Get all orders for admin"""
+    """Get a page of orders for admin, optionally filtered by status and date range"""
     # First check if admin is authenticated
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
     try:
-        orders = Order.query.order_by(Order.created_at.desc()).all()
+        query = orders_with_user()
+        
+        # Optional filters: ?status=Pending&date_from=2024-01-01&date_to=2024-01-31
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Order.status == status)
+        
+        try:
+            date_from = request.args.get('date_from')
+            if date_from:
+                query = query.filter(Order.created_at >= datetime.fromisoformat(date_from))
+            
+            date_to = request.args.get('date_to')
+            if date_to:
+                end = datetime.fromisoformat(date_to)
+                # A bare date includes the whole day
+                if len(date_to) == 10:
+                    end += timedelta(days=1)
+                query = query.filter(Order.created_at < end)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid date filter, expected YYYY-MM-DD'})
+        
+        limit = get_page_limit(request.args)
+        cursor = request.args.get('cursor')
+        
+        try:
+            orders, next_cursor = paginate_keyset(query, Order.created_at, Order.order_id, cursor, limit)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'})
+        
+        # Fetch all items and products for this page in one query
+        items_by_order = load_order_items(orders)
         order_list = []
         
         for order in orders:
-            # Get user info
-            user = db.session.get(User, order.user_id)  # Using modern SQLAlchemy method
+            # User is already loaded by orders_with_user()
+            user = order.user
             user_name = user.username if user else "Unknown User"
             user_email = user.email if user else "Unknown Email"
             
-            # Get order items
-            order_items = OrderItem.query.filter_by(order_id=order.order_id).all()
             items = []
             
-            for item in order_items:
-                product = db.session.get(Product, item.product_id)  # Using modern SQLAlchemy method
+            for item in items_by_order[order.order_id]:
+                product = item.product
                 if product:
                     items.append({
                         'id': str(product.product_id),
@@ -366,7 +356,8 @@ def admin_get_orders():
         
         return jsonify({
             'success': True,
-            'orders': order_list
+            'orders': order_list,
+            'next_cursor': next_cursor
         })
     
     except Exception as e:
@@ -377,14 +368,13 @@ def admin_get_orders():
 def update_admin_profile():
     """Update admin profile information"""
     # First check if admin is authenticated
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
     try:
-        admin_id = auth_data.get('admin_id')
+        admin_id = principal.admin_id
         admin = db.session.get(AdminProfile, admin_id)  # Using modern SQLAlchemy method
         
         if not admin:
@@ -416,10 +406,9 @@ def update_admin_profile():
 def admin_delete_product(product_id):
     """Admin delete a product"""
     # First check if admin is authenticated
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
     try:
@@ -433,6 +422,7 @@ def admin_delete_product(product_id):
         if related_order_items:
             return jsonify({'success': False, 'message': 'Cannot delete product with existing orders'})
         
+        product_removed(product)
         db.session.delete(product)
         db.session.commit()
         
@@ -447,46 +437,139 @@ def admin_delete_product(product_id):
         return jsonify({'success': False, 'message': f'Error deleting product: {str(e)}'})
 
 # Product routes
+def serialize_product(product, seller_name):
+    """JSON fields shared by every product listing and the product detail"""
+    return {
+        'id': str(product.product_id),
+        'name': product.name,
+        'description': product.description,
+        'price': product.price,
+        'stock': product.stock,
+        'category': product.category,
+        **image_fields(product.image_url),
+        'video': product.video_url,
+        'mediaType': product.media_type,
+        'sellerId': str(product.seller_id),
+        'sellerName': seller_name,
+        'createdAt': product.created_at.isoformat()
+    }
+
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    """Get all products for public viewing"""
+    """Get a page of products for public viewing, newest first"""
     try:
-        products = Product.query.all()
+        limit = get_page_limit(request.args)
+        cursor = request.args.get('cursor')
+        
+        cache_key = product_list_key(limit, cursor)
+        cached = get_cached_response(cache_key)
+        if cached:
+            return cached
+        
+        # Answer repeat polls with a 304 before loading or serializing anything
+        etag = make_etag('products', catalogue_version(), limit, cursor)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        try:
+            products, next_cursor = paginate_keyset(
+                products_with_seller(), Product.created_at, Product.product_id, cursor, limit
+            )
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'})
+        
         product_list = []
         
         for product in products:
-            # Get seller info
-            seller = db.session.get(SellerProfile, product.seller_id)  # Using modern SQLAlchemy method
-            seller_name = seller.business_name if seller else "Unknown Seller"
-            
-            product_list.append({
-                'id': str(product.product_id),
-                'name': product.name,
-                'description': product.description,
-                'price': product.price,
-                'stock': product.stock,
-                'category': product.category,
-                'image': product.image_url,
-                'video': product.video_url,
-                'mediaType': product.media_type,
-                'sellerId': str(product.seller_id),
-                'sellerName': seller_name,
-                'createdAt': product.created_at.isoformat()
-            })
+            # Seller is already loaded by products_with_seller()
+            seller = product.seller
+            product_list.append(serialize_product(product, seller.business_name if seller else "Unknown Seller"))
         
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'products': product_list
+            'products': product_list,
+            'next_cursor': next_cursor
         })
+        return with_cache_headers(cache_response(cache_key, response, etag), etag)
     
     except Exception as e:
         print(f"Error fetching products: {str(e)}")
         return jsonify({'success': False, 'message': f'Error fetching products: {str(e)}'})
 
+@app.route('/api/products/facets', methods=['GET'])
+def get_product_facets_route():
+    """Get product counts per category and price bucket for browse filters"""
+    try:
+        facets = get_product_facets()
+        
+        return jsonify({
+            'success': True,
+            'categories': facets['categories'],
+            'prices': facets['prices']
+        })
+    
+    except Exception as e:
+        print(f"Error fetching product facets: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error fetching product facets: {str(e)}'})
+
+@app.route('/api/products/search', methods=['GET'])
+def search_products_route():
+    """Search products by text, category and price range, best matches first"""
+    try:
+        limit = get_page_limit(request.args)
+        
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            min_price = request.args.get('min_price', type=float)
+            max_price = request.args.get('max_price', type=float)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid search parameters'})
+        
+        query = search_products(
+            request.args.get('q', '').strip(),
+            category=request.args.get('category') or None,
+            min_price=min_price,
+            max_price=max_price
+        )
+        
+        # Relevance order has no stable keyset, so search pages by offset.
+        # One extra row tells us whether another page exists.
+        products = query.offset((page - 1) * limit).limit(limit + 1).all()
+        has_more = len(products) > limit
+        products = products[:limit]
+        
+        product_list = []
+        
+        for product in products:
+            seller = product.seller
+            product_list.append(serialize_product(product, seller.business_name if seller else "Unknown Seller"))
+        
+        return jsonify({
+            'success': True,
+            'products': product_list,
+            'page': page,
+            'next_page': page + 1 if has_more else None
+        })
+    
+    except Exception as e:
+        print(f"Error searching products: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error searching products: {str(e)}'})
+
 @app.route('/api/products/<product_id>', methods=['GET'])
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
+        cache_key = product_detail_key(product_id)
+        cached = get_cached_response(cache_key)
+        if cached:
+            return cached
+        
+        etag = make_etag('product', product_id, catalogue_version())
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         product = db.session.get(Product, product_id)  # Using modern SQLAlchemy method
         
         if not product:
@@ -496,26 +579,14 @@ def get_product(product_id):
         seller = db.session.get(SellerProfile, product.seller_id)  # Using modern SQLAlchemy method
         seller_name = seller.business_name if seller else "Unknown Seller"
         
-        product_data = {
-            'id': str(product.product_id),
-            'name': product.name,
-            'description': product.description,
-            'price': product.price,
-            'stock': product.stock,
-            'category': product.category,
-            'image': product.image_url,
-            'video': product.video_url,
-            'mediaType': product.media_type,
-            'sellerId': str(product.seller_id),
-            'sellerName': seller_name,
-            'sellerEmail': seller.email if seller else None,
-            'createdAt': product.created_at.isoformat()
-        }
+        product_data = serialize_product(product, seller_name)
+        product_data['sellerEmail'] = seller.email if seller else None
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'product': product_data
         })
+        return with_cache_headers(cache_response(cache_key, response, etag), etag)
     
     except Exception as e:
         print(f"Error fetching product: {str(e)}")
@@ -525,32 +596,15 @@ def get_product(product_id):
 def get_seller_products():
     """Get products for the authenticated seller"""
     # First check if seller is authenticated
-    auth_check = check_seller_auth()
-    auth_data = auth_check.get_json()
+    principal = current_seller()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Seller not authenticated'})
     
     try:
-        seller_id = auth_data.get('seller_id')
+        seller_id = principal.seller_id
         products = Product.query.filter_by(seller_id=seller_id).all()
-        product_list = []
-        
-        for product in products:
-            product_list.append({
-                'id': str(product.product_id),
-                'name': product.name,
-                'description': product.description,
-                'price': product.price,
-                'stock': product.stock,
-                'category': product.category,
-                'image': product.image_url,
-                'video': product.video_url,
-                'mediaType': product.media_type,
-                'sellerId': str(product.seller_id),
-                'sellerName': auth_data.get('business_name'),
-                'createdAt': product.created_at.isoformat()
-            })
+        product_list = [serialize_product(product, principal.business_name) for product in products]
         
         return jsonify({
             'success': True,
@@ -565,10 +619,9 @@ def get_seller_products():
 def add_product():
     """Add a new product (seller only)"""
     # First check if seller is authenticated
-    auth_check = check_seller_auth()
-    auth_data = auth_check.get_json()
+    principal = current_seller()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Seller not authenticated'})
     
     try:
@@ -579,25 +632,24 @@ def add_product():
             price = float(request.form.get('price', 0))
             stock = int(request.form.get('stock', 0))
             category = request.form.get('category')
-            seller_id = auth_data.get('seller_id')
+            media_type = request.form.get('media_type', 'image')
+            seller_id = principal.seller_id
             
-            # Handle image upload
+            if media_type not in ('image', 'video', 'both'):
+                return jsonify({'success': False, 'message': 'Invalid media type'})
+            
+            # Handle image and video uploads
             image_url = None
-            if 'image' in request.files:
-                file = request.files['image']
-                if file and file.filename != '':
-                    # Generate unique filename
-                    filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    
-                    # Ensure directory exists
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    
-                    # Save file
-                    file.save(file_path)
-                    
-                    # Generate URL
-                    image_url = f"/static/uploads/{filename}"
+            file = request.files.get('image')
+            if file and file.filename != '':
+                image_name = store_upload(file, IMAGE_TYPES)
+                queue_image_variants(image_name)
+                image_url = media_url(image_name)
+            
+            video_url = None
+            file = request.files.get('video')
+            if file and file.filename != '':
+                video_url = media_url(store_upload(file, VIDEO_TYPES))
             
             # Create new product
             new_product = Product(
@@ -607,12 +659,14 @@ def add_product():
                 stock=stock,
                 category=category,
                 image_url=image_url,
+                video_url=video_url,
+                media_type=media_type,
                 seller_id=seller_id
             )
         else:
             # Handle JSON data
             data = request.json
-            seller_id = auth_data.get('seller_id')
+            seller_id = principal.seller_id
             
             # Create new product
             new_product = Product(
@@ -626,6 +680,7 @@ def add_product():
             )
         
         db.session.add(new_product)
+        product_added(new_product)
         db.session.commit()
         
         return jsonify({
@@ -634,6 +689,10 @@ def add_product():
             'productId': new_product.product_id
         })
     
+    except MediaError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+    
     except Exception as e:
         db.session.rollback()
         print(f"Error adding product: {str(e)}")
@@ -643,14 +702,13 @@ def add_product():
 def update_product(product_id):
     """Update product details (seller only)"""
     # First check if seller is authenticated
-    auth_check = check_seller_auth()
-    auth_data = auth_check.get_json()
+    principal = current_seller()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Seller not authenticated'})
     
     try:
-        seller_id = auth_data.get('seller_id')
+        seller_id = principal.seller_id
         product = db.session.get(Product, product_id)  # Using modern SQLAlchemy method
         
         if not product:
@@ -661,6 +719,7 @@ def update_product(product_id):
             return jsonify({'success': False, 'message': 'You do not own this product'})
         
         data = request.json
+        old_category, old_price = product.category, product.price
         
         # Update fields
         if 'name' in data:
@@ -677,6 +736,7 @@ def update_product(product_id):
             product.image_url = data['image']
             
         product.updated_at = datetime.utcnow()
+        product_changed(old_category, old_price, product)
         db.session.commit()
         
         return jsonify({
@@ -693,14 +753,13 @@ def update_product(product_id):
 def delete_product(product_id):
     """Delete a product (seller only)"""
     # First check if seller is authenticated
-    auth_check = check_seller_auth()
-    auth_data = auth_check.get_json()
+    principal = current_seller()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Seller not authenticated'})
     
     try:
-        seller_id = auth_data.get('seller_id')
+        seller_id = principal.seller_id
         product = db.session.get(Product, product_id)  # Using modern SQLAlchemy method
         
         if not product:
@@ -710,6 +769,7 @@ def delete_product(product_id):
         if product.seller_id != int(seller_id):
             return jsonify({'success': False, 'message': 'You do not own this product'})
         
+        product_removed(product)
         db.session.delete(product)
         db.session.commit()
         
@@ -727,38 +787,32 @@ def delete_product(product_id):
 def upload_product_image():
     """Upload a product image and return the URL"""
     # Check authentication first
-    auth_check = check_seller_auth()
-    auth_data = auth_check.get_json()
+    principal = current_seller()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Seller not authenticated'})
     
-    if 'image' not in request.files:
-        return jsonify({'success': False, 'message': 'No image file provided'})
-    
     try:
+        if 'image' not in request.files:
+            return jsonify({'success': False, 'message': 'No image file provided'})
+        
         file = request.files['image']
         if file.filename == '':
             return jsonify({'success': False, 'message': 'No image selected'})
         
-        # Generate unique filename
-        filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Save file
-        file.save(file_path)
-        
-        # Generate URL
-        image_url = f"/static/uploads/{filename}"
+        # Stored under its content hash; re-uploading the same image reuses it
+        image_name = store_upload(file, IMAGE_TYPES)
+        queue_image_variants(image_name)
+        image_url = media_url(image_name)
         
         return jsonify({
             'success': True,
             'imageUrl': image_url
         })
     
+    except MediaError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status_code
+    
     except Exception as e:
         print(f"Error uploading image: {str(e)}")
         return jsonify({'success': False, 'message': f'Error uploading image: {str(e)}'})
@@ -788,6 +842,22 @@ def send_message():
         db.session.add(new_message)
         db.session.commit()
         
+        # Push to the seller's open inbox streams
+        broker.publish(seller_channel(new_message.seller_id), {
+            'type': 'message',
+            'message': {
+                'id': str(new_message.message_id),
+                'senderName': new_message.senderName,
+                'senderEmail': new_message.senderEmail,
+                'content': new_message.content,
+                'productName': new_message.productName,
+                'isRead': False,
+                'createdAt': new_message.created_at.isoformat(),
+                'reply': None,
+                'repliedAt': None
+            }
+        })
+        
         return jsonify({
             'success': True,
             'message': 'Message sent successfully',
@@ -801,13 +871,22 @@ def send_message():
 
 @app.route('/api/seller/messages', methods=['GET'])
 def get_seller_messages():
-    """Get messages for the authenticated seller"""
+    """Get a page of messages for the authenticated seller, newest first"""
     if 'seller_id' not in session:
         return jsonify({'success': False, 'message': 'Seller not authenticated'})
     
     try:
         seller_id = session['seller_id']
-        messages = Message.query.filter_by(seller_id=seller_id).order_by(Message.created_at.desc()).all()
+        limit = get_page_limit(request.args)
+        
+        try:
+            messages, next_cursor = paginate_keyset(
+                Message.query.filter_by(seller_id=seller_id),
+                Message.created_at, Message.message_id, request.args.get('cursor'), limit
+            )
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'})
+        
         message_list = []
         
         for msg in messages:
@@ -817,6 +896,7 @@ def get_seller_messages():
                 'senderEmail': msg.senderEmail,
                 'content': msg.content,
                 'productName': msg.productName,
+                'isRead': bool(msg.is_read),
                 'createdAt': msg.created_at.isoformat(),
                 'reply': msg.reply,
                 'repliedAt': msg.replied_at.isoformat() if msg.replied_at else None
@@ -824,13 +904,65 @@ def get_seller_messages():
         
         return jsonify({
             'success': True,
-            'messages': message_list
+            'messages': message_list,
+            'next_cursor': next_cursor
         })
     
     except Exception as e:
         print(f"Error fetching messages: {str(e)}")
         return jsonify({'success': False, 'message': f'Error fetching messages: {str(e)}'})
 
+@app.route('/api/seller/messages/unread-count', methods=['GET'])
+def get_unread_message_count():
+    """Get the number of unread messages for the authenticated seller"""
+    if 'seller_id' not in session:
+        return jsonify({'success': False, 'message': 'Seller not authenticated'})
+    
+    try:
+        return jsonify({
+            'success': True,
+            'count': count_unread_messages(session['seller_id'])
+        })
+    
+    except Exception as e:
+        print(f"Error counting unread messages: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error counting unread messages: {str(e)}'})
+
+@app.route('/api/seller/messages/mark-read', methods=['POST'])
+def mark_messages_read():
+    """Mark the given messages (or, with "all": true, every message) as read"""
+    if 'seller_id' not in session:
+        return jsonify({'success': False, 'message': 'Seller not authenticated'})
+    
+    try:
+        data = request.json or {}
+        seller_id = session['seller_id']
+        
+        query = Message.query.filter_by(seller_id=seller_id, is_read=False)
+        if not data.get('all'):
+            try:
+                message_ids = [int(message_id) for message_id in data.get('messageIds', [])]
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'message': 'Invalid message IDs'})
+            if not message_ids:
+                return jsonify({'success': False, 'message': 'No messages specified'})
+            query = query.filter(Message.message_id.in_(message_ids))
+        
+        # One UPDATE for the whole batch
+        updated = query.update({Message.is_read: True}, synchronize_session=False)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'updated': updated,
+            'unreadCount': count_unread_messages(seller_id)
+        })
+    
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error marking messages read: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error marking messages read: {str(e)}'})
+
 @app.route('/api/messages/<message_id>/reply', methods=['POST'])
 def reply_to_message(message_id):
     """Reply to a customer message"""
@@ -855,6 +987,17 @@ def reply_to_message(message_id):
         message.replied_at = datetime.utcnow()
         db.session.commit()
         
+        # Push to the buyer's open message streams (and the seller's other tabs)
+        reply_event = {
+            'type': 'reply',
+            'messageId': str(message.message_id),
+            'reply': message.reply,
+            'repliedAt': message.replied_at.isoformat()
+        }
+        if message.senderEmail:
+            broker.publish(buyer_channel(message.senderEmail), reply_event)
+        broker.publish(seller_channel(message.seller_id), reply_event)
+        
         return jsonify({
             'success': True,
             'message': 'Reply sent successfully'
@@ -865,6 +1008,31 @@ def reply_to_message(message_id):
         print(f"Error sending reply: {str(e)}")
         return jsonify({'success': False, 'message': f'Error sending reply: {str(e)}'})
 
+@app.route('/api/seller/messages/stream', methods=['GET'])
+def stream_seller_messages():
+    """Server-Sent Events stream of new messages and replies for the authenticated seller"""
+    if 'seller_id' not in session:
+        return jsonify({'success': False, 'message': 'Seller not authenticated'})
+    
+    return Response(
+        event_stream(seller_channel(session['seller_id'])),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/user/messages/stream', methods=['GET'])
+def stream_user_messages():
+    """Server-Sent Events stream of replies to messages sent from an email address"""
+    email = request.args.get('email')
+    if not email:
+        return jsonify({'success': False, 'message': 'Email parameter required'})
+    
+    return Response(
+        event_stream(buyer_channel(email)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/user/messages', methods=['GET'])
 def get_user_messages():
     """Get messages for a user by email"""
@@ -935,13 +1103,14 @@ def get_cart():
     
     try:
         user_id = session['user_id']
-        cart_items = CartItem.query.filter_by(user_id=user_id).all()
+        cart_items = cart_items_with_products(user_id).all()
         cart = []
         
         for item in cart_items:
-            product = db.session.get(Product, item.product_id)  # Using modern SQLAlchemy method
+            # Product and seller are already loaded by cart_items_with_products()
+            product = item.product
             if product:
-                seller = SellerProfile.query.get(product.seller_id)  # Using modern SQLAlchemy method
+                seller = product.seller
                 
                 cart.append({
                     'id': str(product.product_id),
@@ -976,17 +1145,19 @@ def update_cart():
         user_id = session['user_id']
         data = request.json
         
+        # One row per product: repeated lines are merged by summing their
+        # quantities, as add_indexes.py did for rows already stored
+        quantities = {}
+        for item in data['items']:
+            product_id = int(item['id'])
+            quantities[product_id] = quantities.get(product_id, 0) + item['quantity']
+        
         # Clear existing cart items for this user
         CartItem.query.filter_by(user_id=user_id).delete()
         
         # Add new cart items
-        for item in data['items']:
-            cart_item = CartItem(
-                user_id=user_id,
-                product_id=int(item['id']),
-                quantity=item['quantity']
-            )
-            db.session.add(cart_item)
+        for product_id, quantity in quantities.items():
+            db.session.add(CartItem(user_id=user_id, product_id=product_id, quantity=quantity))
         
         db.session.commit()
         
@@ -1000,6 +1171,94 @@ def update_cart():
         print(f"Error updating cart: {str(e)}")
         return jsonify({'success': False, 'message': f'Error updating cart: {str(e)}'})
 
+@app.route('/api/cart/items', methods=['POST'])
+def add_cart_item():
+    """Add a product to the authenticated user's cart, or increase its quantity"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'User not authenticated'})
+    
+    try:
+        data = request.json
+        product_id = int(data.get('product_id') or data.get('id'))
+        quantity = int(data.get('quantity', 1))
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'A numeric product id and quantity are required'})
+    
+    if quantity < 1:
+        return jsonify({'success': False, 'message': 'Quantity must be at least 1'})
+    
+    try:
+        add_to_cart(session['user_id'], product_id, quantity)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Item added to cart'
+        })
+    
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Product not found'})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error adding cart item: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error updating cart: {str(e)}'})
+
+@app.route('/api/cart/items/<int:product_id>', methods=['PATCH'])
+def set_cart_item_quantity(product_id):
+    """Set the quantity of a product in the authenticated user's cart"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'User not authenticated'})
+    
+    try:
+        quantity = int(request.json.get('quantity'))
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'A numeric quantity is required'})
+    
+    try:
+        # A quantity of zero or less removes the item
+        if quantity < 1:
+            remove_from_cart(session['user_id'], product_id)
+        else:
+            set_cart_quantity(session['user_id'], product_id, quantity)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Cart updated successfully'
+        })
+    
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Product not found'})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error setting cart item quantity: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error updating cart: {str(e)}'})
+
+@app.route('/api/cart/items/<int:product_id>', methods=['DELETE'])
+def remove_cart_item(product_id):
+    """Remove a product from the authenticated user's cart"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'User not authenticated'})
+    
+    try:
+        removed = remove_from_cart(session['user_id'], product_id)
+        db.session.commit()
+        
+        if not removed:
+            return jsonify({'success': False, 'message': 'Item not in cart'})
+        
+        return jsonify({
+            'success': True,
+            'message': 'Item removed from cart'
+        })
+    
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error removing cart item: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error updating cart: {str(e)}'})
+
 @app.route('/api/cart/clear', methods=['DELETE'])
 def clear_cart():
     """Clear all cart items for the authenticated user"""
@@ -1051,13 +1310,65 @@ def create_order():
         if not order_id:
             order_id = str(uuid.uuid4())
         
-        total = float(data.get('total', 0))
         status = data.get('status', 'Pending')
         items = data.get('items', [])
         
         if not items:
             return jsonify({'success': False, 'message': 'No items in order'})
         
+        # Collect requested quantities per product, merging repeated lines
+        quantities = {}
+        for item in items:
+            # Handle both string and int product_id
+            product_id = item.get('product_id') or item.get('id')
+            if isinstance(product_id, str) and not product_id.isdigit():
+                # Skip non-numeric product IDs (like 'broilers')
+                print(f"Skipping invalid product_id: {product_id}")
+                continue
+            
+            quantity = int(item.get('quantity', 1))
+            if quantity < 1:
+                return jsonify({'success': False, 'message': 'Item quantities must be at least 1'})
+            
+            product_id = int(product_id)
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        
+        if not quantities:
+            return jsonify({'success': False, 'message': 'No valid items in order'})
+        
+        # Fetch and lock every product in one query, so concurrent checkouts
+        # of the same products wait here instead of overselling
+        products = Product.query.filter(
+            Product.product_id.in_(list(quantities))
+        ).order_by(Product.product_id).with_for_update().all()
+        
+        for product_id in set(quantities) - {product.product_id for product in products}:
+            print(f"Product not found: {product_id}")
+        
+        if not products:
+            return jsonify({'success': False, 'message': 'No valid items in order'})
+        
+        # Prices and the total come from the database, not the client
+        order_items = []
+        total = 0.0
+        for product in products:
+            quantity = quantities[product.product_id]
+            if product.stock < quantity:
+                db.session.rollback()
+                return jsonify({
+                    'success': False,
+                    'message': f'Only {product.stock} of {product.name} left in stock'
+                })
+            
+            product.stock -= quantity
+            total += product.price * quantity
+            order_items.append({
+                'order_id': order_id,
+                'product_id': product.product_id,
+                'quantity': quantity,
+                'price': product.price
+            })
+        
         print(f"Creating order with ID: {order_id}")
         
         # Create new order
@@ -1069,34 +1380,10 @@ def create_order():
         )
         
         db.session.add(new_order)
-        db.session.flush()  # Get the order ID
+        db.session.flush()  # Insert the order and stock updates before its items
         
-        # Add order items
-        for item in items:
-            # Handle both string and int product_id
-            product_id = item.get('product_id') or item.get('id')
-            if isinstance(product_id, str) and not product_id.isdigit():
-                # Skip non-numeric product IDs (like 'broilers')
-                print(f"Skipping invalid product_id: {product_id}")
-                continue
-                
-            product_id = int(product_id)
-            
-            # Verify product exists
-            product = db.session.get(Product, product_id)
-            if not product:
-                print(f"Product not found: {product_id}")
-                continue
-            
-            print(f"Adding order item: Product {product_id}, Quantity {item.get('quantity', 1)}")
-            
-            order_item = OrderItem(
-                order_id=new_order.order_id,
-                product_id=product_id,
-                quantity=int(item.get('quantity', 1)),
-                price=float(item.get('price', 0))
-            )
-            db.session.add(order_item)
+        # Add all order items in one bulk insert
+        db.session.execute(insert(OrderItem), order_items)
         
         # Clear the user's cart after creating order
         CartItem.query.filter_by(user_id=user_id).delete()
@@ -1108,7 +1395,8 @@ def create_order():
         return jsonify({
             'success': True,
             'message': 'Order created successfully',
-            'orderId': new_order.order_id
+            'orderId': new_order.order_id,
+            'total': total
         })
     
     except Exception as e:
@@ -1127,15 +1415,16 @@ def get_user_orders():
     try:
         user_id = session['user_id']
         orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
+        
+        # Fetch all items and products for these orders in one query
+        items_by_order = load_order_items(orders)
         order_list = []
         
         for order in orders:
-            # Get order items
-            order_items = OrderItem.query.filter_by(order_id=order.order_id).all()
             items = []
             
-            for item in order_items:
-                product = db.session.get(Product, item.product_id)  # Using modern SQLAlchemy method
+            for item in items_by_order[order.order_id]:
+                product = item.product
                 if product:
                     items.append({
                         'id': str(product.product_id),
@@ -1197,80 +1486,55 @@ def update_order_status(order_id):
 # Admin report generation endpoints
 @app.route('/api/admin/reports/users/download', methods=['GET'])
 def download_users_report():
-    """Generate and download users report as CSV"""
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    """Stream users report as CSV"""
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
-    try:
-        # Create CSV data
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow(['User ID', 'Username', 'Email', 'Phone Number', 'Registration Date', 'User Type'])
-        
+    def rows():
         # Write buyers data
-        users = User.query.all()
-        for user in users:
-            writer.writerow([
+        for user in report_query(User.query):
+            yield [
                 user.user_id,
                 user.username,
                 user.email,
                 user.phone_number or 'N/A',
                 user.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'Buyer'
-            ])
+            ]
         
         # Write sellers data
-        sellers = SellerProfile.query.all()
-        for seller in sellers:
-            writer.writerow([
+        for seller in report_query(SellerProfile.query):
+            yield [
                 f"S-{seller.seller_id}",
                 seller.username,
                 seller.email,
                 seller.phone_number or 'N/A',
                 seller.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 f'Seller ({seller.approval_status})'
-            ])
-        
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=users_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        
-        return response
+            ]
     
-    except Exception as e:
-        print(f"Error generating users report: {str(e)}")
-        return jsonify({'success': False, 'message': f'Error generating report: {str(e)}'})
+    return stream_csv_report(
+        'users',
+        ['User ID', 'Username', 'Email', 'Phone Number', 'Registration Date', 'User Type'],
+        rows()
+    )
 
 @app.route('/api/admin/reports/products/download', methods=['GET'])
 def download_products_report():
-    """Generate and download products report as CSV"""
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    """Stream products report as CSV"""
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
-    try:
-        # Create CSV data
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow(['Product ID', 'Product Name', 'Category', 'Price (KShs)', 'Stock', 'Seller', 'Created Date'])
-        
-        # Write products data
-        products = Product.query.all()
-        for product in products:
-            seller = SellerProfile.query.get(product.seller_id)
+    def rows():
+        for product in report_query(products_with_seller()):
+            seller = product.seller
             seller_name = seller.business_name if seller else 'Unknown Seller'
             
-            writer.writerow([
+            yield [
                 product.product_id,
                 product.name,
                 product.category,
@@ -1278,91 +1542,84 @@ def download_products_report():
                 product.stock,
                 seller_name,
                 product.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=products_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        
-        return response
+            ]
     
-    except Exception as e:
-        print(f"Error generating products report: {str(e)}")
-        return jsonify({'success': False, 'message': f'Error generating report: {str(e)}'})
+    return stream_csv_report(
+        'products',
+        ['Product ID', 'Product Name', 'Category', 'Price (KShs)', 'Stock', 'Seller', 'Created Date'],
+        rows()
+    )
 
 @app.route('/api/admin/reports/orders/download', methods=['GET'])
 def download_orders_report():
-    """Generate and download orders report as CSV"""
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    """Stream orders report as CSV"""
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
-    try:
-        # Create CSV data
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow(['Order ID', 'Customer', 'Customer Email', 'Total Amount (KShs)', 'Status', 'Order Date', 'Items Count'])
-        
-        # Write orders data
-        orders = Order.query.all()
-        for order in orders:
-            user = User.query.get(order.user_id)
-            customer_name = user.username if user else 'Unknown Customer'
-            customer_email = user.email if user else 'Unknown Email'
-            
-            # Count order items
-            items_count = OrderItem.query.filter_by(order_id=order.order_id).count()
-            
-            writer.writerow([
-                order.order_id,
-                customer_name,
-                customer_email,
-                order.total,
-                order.status,
-                order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+    def rows():
+        # Item counts per order, computed in one GROUP BY
+        item_counts = db.session.query(
+            OrderItem.order_id,
+            func.count(OrderItem.product_id).label('items_count')
+        ).group_by(OrderItem.order_id).subquery()
+        
+        orders = report_query(db.session.query(
+            Order.order_id,
+            Order.total,
+            Order.status,
+            Order.created_at,
+            User.username,
+            User.email,
+            func.coalesce(item_counts.c.items_count, 0)
+        ).outerjoin(
+            User, Order.user_id == User.user_id
+        ).outerjoin(
+            item_counts, item_counts.c.order_id == Order.order_id
+        ))
+        
+        for order_id, total, status, created_at, username, email, items_count in orders:
+            yield [
+                order_id,
+                username or 'Unknown Customer',
+                email or 'Unknown Email',
+                total,
+                status,
+                created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 items_count
-            ])
-        
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=orders_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        
-        return response
+            ]
     
-    except Exception as e:
-        print(f"Error generating orders report: {str(e)}")
-        return jsonify({'success': False, 'message': f'Error generating report: {str(e)}'})
+    return stream_csv_report(
+        'orders',
+        ['Order ID', 'Customer', 'Customer Email', 'Total Amount (KShs)', 'Status', 'Order Date', 'Items Count'],
+        rows()
+    )
 
 @app.route('/api/admin/reports/sellers/download', methods=['GET'])
 def download_sellers_report():
-    """Generate and download sellers report as CSV"""
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    """Stream sellers report as CSV"""
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
-    try:
-        # Create CSV data
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow(['Seller ID', 'Username', 'Business Name', 'Email', 'Phone', 'Status', 'Products Count', 'Registration Date'])
-        
-        # Write sellers data
-        sellers = SellerProfile.query.all()
-        for seller in sellers:
-            # Count products for this seller
-            products_count = Product.query.filter_by(seller_id=seller.seller_id).count()
-            
-            writer.writerow([
+    def rows():
+        # Product counts per seller, computed in one GROUP BY
+        product_counts = db.session.query(
+            Product.seller_id,
+            func.count(Product.product_id).label('products_count')
+        ).group_by(Product.seller_id).subquery()
+        
+        sellers = report_query(db.session.query(
+            SellerProfile,
+            func.coalesce(product_counts.c.products_count, 0)
+        ).outerjoin(
+            product_counts, product_counts.c.seller_id == SellerProfile.seller_id
+        ))
+        
+        for seller, products_count in sellers:
+            yield [
                 seller.seller_id,
                 seller.username,
                 seller.business_name,
@@ -1371,49 +1628,36 @@ def download_sellers_report():
                 seller.approval_status,
                 products_count,
                 seller.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=sellers_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        
-        return response
+            ]
     
-    except Exception as e:
-        print(f"Error generating sellers report: {str(e)}")
-        return jsonify({'success': False, 'message': f'Error generating report: {str(e)}'})
+    return stream_csv_report(
+        'sellers',
+        ['Seller ID', 'Username', 'Business Name', 'Email', 'Phone', 'Status', 'Products Count', 'Registration Date'],
+        rows()
+    )
 
 @app.route('/api/admin/reports/sales/download', methods=['GET'])
 def download_sales_report():
-    """Generate and download sales summary report as CSV"""
-    auth_check = check_admin_auth()
-    auth_data = auth_check.get_json()
+    """Stream sales summary report as CSV"""
+    principal = current_admin()
     
-    if not auth_data.get('isAuthenticated'):
+    if not principal:
         return jsonify({'success': False, 'message': 'Admin not authenticated'})
     
-    try:
-        # Create CSV data
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow(['Order ID', 'Product Name', 'Seller', 'Quantity', 'Unit Price (KShs)', 'Total (KShs)', 'Order Date', 'Status'])
-        
-        # Write sales data (order items with details)
-        order_items = db.session.query(OrderItem, Order, Product, SellerProfile).join(
+    def rows():
+        # Sales data (order items with details)
+        order_items = report_query(db.session.query(OrderItem, Order, Product, SellerProfile).join(
             Order, OrderItem.order_id == Order.order_id
         ).join(
             Product, OrderItem.product_id == Product.product_id
         ).join(
             SellerProfile, Product.seller_id == SellerProfile.seller_id
-        ).all()
+        ))
         
         for order_item, order, product, seller in order_items:
             total_price = order_item.quantity * order_item.price
             
-            writer.writerow([
+            yield [
                 order.order_id,
                 product.name,
                 seller.business_name,
@@ -1422,18 +1666,13 @@ def download_sales_report():
                 total_price,
                 order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 order.status
-            ])
-        
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=sales_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        
-        return response
+            ]
     
-    except Exception as e:
-        print(f"Error generating sales report: {str(e)}")
-        return jsonify({'success': False, 'message': f'Error generating report: {str(e)}'})
+    return stream_csv_report(
+        'sales',
+        ['Order ID', 'Product Name', 'Seller', 'Quantity', 'Unit Price (KShs)', 'Total (KShs)', 'Order Date', 'Status'],
+        rows()
+    )
 
 if __name__ == '__main__':
     with app.app_context():
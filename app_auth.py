@@ -1,44 +1,108 @@
+from flask import g, jsonify, session
+from models import db, SellerProfile, AdminProfile
+from cache import TTLCache
+from session_events import on_commit_of
 
-from flask import jsonify, session
-from models import User, SellerProfile, AdminProfile
+# Seconds a signed-in seller's or admin's profile may be reused before it is
+# read from the database again. Profile writes drop the cached copy on
+# commit, so the TTL only bounds changes made outside this process.
+PROFILE_CACHE_TTL = 60
+
+_profile_cache = TTLCache(PROFILE_CACHE_TTL)
+
+class AdminPrincipal:
+    """The signed-in admin, as loaded from AdminProfile"""
+
+    def __init__(self, admin):
+        self.admin_id = admin.admin_id
+        self.username = admin.username
+        self.email = admin.email
+        self.role = admin.role
+        self.department = admin.department
+        self.phone_number = admin.phone_number
+
+    def to_dict(self):
+        return {
+            'isAuthenticated': True,
+            'admin_id': self.admin_id,
+            'username': self.username,
+            'email': self.email,
+            'role': self.role,
+            'department': self.department,
+            'phone_number': self.phone_number
+        }
+
+class SellerPrincipal:
+    """The signed-in seller, as loaded from SellerProfile"""
+
+    def __init__(self, seller):
+        self.seller_id = seller.seller_id
+        self.username = seller.username
+        self.email = seller.email
+        self.business_name = seller.business_name
+        self.business_description = seller.business_description
+        self.approval_status = seller.approval_status
+        self.phone_number = seller.phone_number
+
+    def to_dict(self):
+        return {
+            'isAuthenticated': True,
+            'seller_id': self.seller_id,
+            'username': self.username,
+            'email': self.email,
+            'business_name': self.business_name,
+            'business_description': self.business_description,
+            'approval_status': self.approval_status,
+            'phone_number': self.phone_number
+        }
+
+def _load_principal(kind, model, principal_class):
+    """Principal for the id stored in the session under f'{kind}_id', or None.
+
+    Loaded at most once per request and, across requests, from the profile
+    cache when possible.
+    """
+    attribute = f'{kind}_principal'
+    if attribute in g:
+        return g.get(attribute)
+
+    principal = None
+    principal_id = session.get(f'{kind}_id')
+    if principal_id is not None:
+        cache_key = (kind, principal_id)
+        principal = _profile_cache.get(cache_key)
+        if principal is None:
+            profile = db.session.get(model, principal_id)
+            if profile:
+                principal = principal_class(profile)
+                _profile_cache.set(cache_key, principal)
+
+    setattr(g, attribute, principal)
+    return principal
+
+def current_admin():
+    """The signed-in admin as an AdminPrincipal, or None"""
+    return _load_principal('admin', AdminProfile, AdminPrincipal)
+
+def current_seller():
+    """The signed-in seller as a SellerPrincipal, or None"""
+    return _load_principal('seller', SellerProfile, SellerPrincipal)
 
 def check_admin_auth():
-    if 'admin_id' in session:
-        admin_id = session['admin_id']
-        
-        # Get admin user details directly from AdminProfile
-        admin = AdminProfile.query.filter_by(admin_id=admin_id).first()
-        
-        if admin:
-            return jsonify({
-                'isAuthenticated': True,
-                'admin_id': admin.admin_id,
-                'username': admin.username,
-                'email': admin.email,
-                'role': admin.role,
-                'department': admin.department,
-                'phone_number': admin.phone_number
-            })
-    
-    return jsonify({'isAuthenticated': False})
+    admin = current_admin()
+    return jsonify(admin.to_dict() if admin else {'isAuthenticated': False})
 
 def check_seller_auth():
-    if 'seller_id' in session:
-        seller_id = session['seller_id']
-        
-        # Get seller profile directly from SellerProfile
-        seller = SellerProfile.query.filter_by(seller_id=seller_id).first()
-        
-        if seller:
-            return jsonify({
-                'isAuthenticated': True,
-                'seller_id': seller.seller_id,
-                'username': seller.username,
-                'email': seller.email,
-                'business_name': seller.business_name,
-                'business_description': seller.business_description,
-                'approval_status': seller.approval_status,
-                'phone_number': seller.phone_number
-            })
-    
-    return jsonify({'isAuthenticated': False})
+    seller = current_seller()
+    return jsonify(seller.to_dict() if seller else {'isAuthenticated': False})
+
+def invalidate_profile(kind, principal_id):
+    _profile_cache.delete((kind, principal_id))
+
+_PROFILE_KINDS = {SellerProfile: 'seller', AdminProfile: 'admin'}
+
+def _invalidate_written_profiles(written):
+    for model, principal_id in written:
+        invalidate_profile(_PROFILE_KINDS[model], principal_id)
+
+on_commit_of((SellerProfile, AdminProfile), _invalidate_written_profiles)
@@ -0,0 +1,212 @@
+
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+from models import db
+from add_indexes import create_missing_indexes
+
+# Run against a scratch database, never the live one: the indexes are
+# dropped and recreated while measuring.
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'BENCHMARK_DATABASE_URI', 'mysql+pymysql://root:@localhost/kukuhub_bench'
+)
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+db.init_app(app)
+
+# Seeded dataset size
+SELLERS = 200
+PRODUCTS_PER_SELLER = 50
+USERS = 5000
+ORDERS_PER_USER = 10
+ITEMS_PER_ORDER = 3
+CART_ITEMS_PER_USER = 3
+MESSAGES_PER_SELLER = 100
+
+# Timed executions per query and phase
+RUNS = 20
+BATCH_SIZE = 1000
+
+CATEGORIES = ['Chicken', 'Eggs', 'Chicks', 'Feeds', 'Equipment']
+STATUSES = ['Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled']
+
+# The hot filters used by app.py
+QUERIES = [
+    ('products by seller',
+     "SELECT * FROM products WHERE seller_id = :seller_id"),
+    ('products by category',
+     "SELECT * FROM products WHERE category = :category"),
+    ('seller inbox',
+     "SELECT * FROM messages WHERE seller_id = :seller_id ORDER BY created_at DESC"),
+    ('messages by sender email',
+     "SELECT * FROM messages WHERE senderEmail = :email ORDER BY created_at DESC"),
+    ('cart items by user',
+     "SELECT * FROM cart_items WHERE user_id = :user_id"),
+    ('order history by user',
+     "SELECT * FROM orders WHERE user_id = :user_id ORDER BY created_at DESC"),
+    ('orders by status',
+     "SELECT * FROM orders WHERE status = :status ORDER BY created_at DESC LIMIT 50"),
+    ('order items by order',
+     "SELECT * FROM order_items WHERE order_id = :order_id"),
+]
+
+def insert_rows(conn, table, rows):
+    """Insert a list of dicts in executemany batches"""
+    if not rows:
+        return
+    columns = list(rows[0])
+    statement = text(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"
+    )
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(statement, rows[start:start + BATCH_SIZE])
+
+def seed(conn, rng):
+    """Fill the benchmark database with a synthetic catalogue, orders and messages"""
+    password_hash = generate_password_hash('benchmark')
+    start = datetime(2024, 1, 1)
+
+    def timestamp():
+        return start + timedelta(minutes=rng.randrange(365 * 24 * 60))
+
+    insert_rows(conn, 'seller_profile', [{
+        'seller_id': s, 'username': f'seller{s}', 'email': f'seller{s}@bench.test',
+        'password_hash': password_hash, 'business_name': f'Farm {s}',
+        'approval_status': 'approved', 'created_at': timestamp()
+    } for s in range(1, SELLERS + 1)])
+
+    insert_rows(conn, 'users', [{
+        'user_id': u, 'username': f'user{u}', 'email': f'user{u}@bench.test',
+        'password_hash': password_hash, 'created_at': timestamp()
+    } for u in range(1, USERS + 1)])
+
+    product_count = SELLERS * PRODUCTS_PER_SELLER
+    insert_rows(conn, 'products', [{
+        'product_id': p, 'name': f'Product {p}', 'description': 'Benchmark product',
+        'price': rng.randrange(100, 5000), 'stock': rng.randrange(100),
+        'category': rng.choice(CATEGORIES), 'media_type': 'image',
+        'seller_id': (p - 1) % SELLERS + 1, 'created_at': timestamp(), 'updated_at': start
+    } for p in range(1, product_count + 1)])
+
+    insert_rows(conn, 'messages', [{
+        'content': 'Is this still available?', 'senderName': f'user{u}',
+        'senderEmail': f'user{u}@bench.test', 'productName': 'Product',
+        'seller_id': s, 'is_read': rng.random() < 0.5, 'created_at': timestamp()
+    } for s in range(1, SELLERS + 1)
+      for u in rng.sample(range(1, USERS + 1), MESSAGES_PER_SELLER)])
+
+    insert_rows(conn, 'cart_items', [{
+        'user_id': u, 'product_id': p, 'quantity': rng.randrange(1, 5),
+        'created_at': start, 'updated_at': start
+    } for u in range(1, USERS + 1)
+      for p in rng.sample(range(1, product_count + 1), CART_ITEMS_PER_USER)])
+
+    orders = []
+    order_items = []
+    for u in range(1, USERS + 1):
+        for _ in range(ORDERS_PER_USER):
+            order_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            orders.append({
+                'order_id': order_id, 'user_id': u, 'total': 0,
+                'status': rng.choice(STATUSES), 'created_at': timestamp(), 'updated_at': start
+            })
+            for p in rng.sample(range(1, product_count + 1), ITEMS_PER_ORDER):
+                order_items.append({
+                    'order_id': order_id, 'product_id': p,
+                    'quantity': rng.randrange(1, 5), 'price': rng.randrange(100, 5000)
+                })
+    insert_rows(conn, 'orders', orders)
+    insert_rows(conn, 'order_items', order_items)
+
+def drop_declared_indexes(conn):
+    """Drop the indexes declared in models.py to get the 'before' baseline"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with conn.begin_nested():
+                    index.drop(bind=conn)
+                print(f"Dropped index {index.name}")
+            except Exception as e:
+                # MySQL keeps an index that a foreign key still depends on
+                print(f"Kept index {index.name}: {str(e).splitlines()[0]}")
+
+def sample_params(conn, rng):
+    """Pick realistic parameter values for QUERIES from the seeded data"""
+    user_id = rng.randrange(1, USERS + 1)
+    return {
+        'seller_id': rng.randrange(1, SELLERS + 1),
+        'category': rng.choice(CATEGORIES),
+        'email': f'user{user_id}@bench.test',
+        'user_id': user_id,
+        'status': rng.choice(STATUSES),
+        'order_id': conn.execute(
+            text("SELECT order_id FROM orders WHERE user_id = :user_id LIMIT 1"), {'user_id': user_id}
+        ).scalar()
+    }
+
+def explain(conn, sql, params):
+    """Return a one-line summary of the query plan"""
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).mappings().all()
+        return '; '.join(row['detail'] for row in rows)
+
+    rows = conn.execute(text(f"EXPLAIN {sql}"), params).mappings().all()
+    return '; '.join(
+        f"type={row['type']} key={row['key']} rows={row['rows']} extra={row['Extra']}" for row in rows
+    )
+
+def measure(conn, params):
+    """Time every query and capture its plan; returns {name: (median_ms, plan)}"""
+    results = {}
+    for name, sql in QUERIES:
+        timings = []
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (statistics.median(timings), explain(conn, sql, params))
+    return results
+
+def run_benchmark():
+    rng = random.Random(42)
+
+    with app.app_context():
+        db.create_all()
+
+        with db.engine.connect() as conn:
+            if not conn.execute(text("SELECT COUNT(*) FROM products")).scalar():
+                print("Seeding benchmark database...")
+                seed(conn, rng)
+                conn.commit()
+
+            params = sample_params(conn, rng)
+
+            print("\nDropping declared indexes for the baseline...")
+            drop_declared_indexes(conn)
+            conn.commit()
+            before = measure(conn, params)
+
+            print("\nCreating indexes...")
+            create_missing_indexes(conn)
+            conn.commit()
+            after = measure(conn, params)
+
+    print(f"\n{'Query':<28}{'Before (ms)':>14}{'After (ms)':>14}")
+    for name, _ in QUERIES:
+        print(f"{name:<28}{before[name][0]:>14.3f}{after[name][0]:>14.3f}")
+
+    print("\nQuery plans:")
+    for name, _ in QUERIES:
+        print(f"\n{name}")
+        print(f"  before: {before[name][1]}")
+        print(f"  after:  {after[name][1]}")
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,42 @@
+
+from datetime import datetime
+from sqlalchemy.dialects.mysql import insert
+from models import db, CartItem
+
+# Each cart change is a single statement against the unique
+# (user_id, product_id) key, so row locks are held only briefly.
+
+def add_to_cart(user_id, product_id, quantity):
+    """Add quantity of a product to the user's cart, creating the row if needed"""
+    now = datetime.utcnow()
+    statement = insert(CartItem.__table__).values(
+        user_id=user_id,
+        product_id=product_id,
+        quantity=quantity,
+        created_at=now,
+        updated_at=now
+    )
+    db.session.execute(statement.on_duplicate_key_update(
+        quantity=CartItem.__table__.c.quantity + statement.inserted.quantity,
+        updated_at=statement.inserted.updated_at
+    ))
+
+def set_cart_quantity(user_id, product_id, quantity):
+    """Set the quantity of a product in the user's cart, creating the row if needed"""
+    now = datetime.utcnow()
+    statement = insert(CartItem.__table__).values(
+        user_id=user_id,
+        product_id=product_id,
+        quantity=quantity,
+        created_at=now,
+        updated_at=now
+    )
+    db.session.execute(statement.on_duplicate_key_update(
+        quantity=statement.inserted.quantity,
+        updated_at=statement.inserted.updated_at
+    ))
+
+def remove_from_cart(user_id, product_id):
+    """Remove a product from the user's cart; returns True if a row was deleted"""
+    deleted = CartItem.query.filter_by(user_id=user_id, product_id=product_id).delete()
+    return deleted > 0
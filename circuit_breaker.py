@@ -0,0 +1,81 @@
+
+import threading
+import time
+from metrics import Counter, Gauge
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+class CircuitBreaker:
+    """Fail fast after repeated failures of an external dependency.
+
+    closed:    calls go through; failure_threshold consecutive failures open it
+    open:      calls are rejected until reset_timeout seconds have passed
+    half_open: one trial call goes through; success closes the circuit,
+               failure opens it again for another reset_timeout
+    """
+
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+
+    # Gauge values for each state
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        self.state_gauge = Gauge(f'{name}_circuit_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open)')
+        self.state_gauge.set_function(lambda: self.STATE_VALUES[self.state])
+        self.opened_total = Counter(f'{name}_circuit_opened_total', 'Times the circuit breaker opened')
+        self.rejected_total = Counter(f'{name}_circuit_rejected_total', 'Calls rejected while the circuit was open')
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """Return True if a call may go ahead; the caller must then record its outcome"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected_total.inc()
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self._state == self.HALF_OPEN:
+                # Only one trial call at a time while half-open
+                if self._trial_in_flight:
+                    self.rejected_total.inc()
+                    return False
+                self._trial_in_flight = True
+
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_total.inc()
+                    print(f"Circuit {self.name} opened after {self._failures} consecutive failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
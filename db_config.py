@@ -0,0 +1,83 @@
+
+import os
+import time
+from dotenv import load_dotenv
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from metrics import Counter, Gauge, Histogram
+
+load_dotenv()
+
+# Database and connection pool settings, overridable from the environment
+# (or a .env file). Every Flask app and maintenance script configures its
+# engine through configure_database() so they all behave the same.
+DEFAULT_DATABASE_URI = 'mysql+pymysql://root:@localhost/kukuhub'
+
+POOL_CHECKOUTS = Counter('db_pool_checkouts_total', 'Connections checked out of the pool')
+POOL_TIMEOUTS = Counter('db_pool_checkout_timeouts_total', 'Checkouts that gave up after DB_POOL_TIMEOUT')
+POOL_CHECKOUT_SECONDS = Histogram(
+    'db_pool_checkout_seconds', 'Time spent waiting for a connection, including opening a new one'
+)
+POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections currently in use')
+POOL_SIZE = Gauge('db_pool_size', 'Configured number of persistent connections')
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout counts, wait times and timeouts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        POOL_CHECKED_OUT.set_function(self.checkedout)
+        POOL_SIZE.set(self.size())
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+        POOL_CHECKOUTS.inc()
+        return connection
+
+def database_uri():
+    return os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URI)
+
+def engine_options():
+    """SQLAlchemy engine options built from the DB_* environment variables"""
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        # Recycle before MySQL's wait_timeout closes idle connections
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        # Test each connection on checkout so "server has gone away" errors
+        # after an idle period reconnect instead of failing the request
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+    # Abort long-running SELECTs on the server (MySQL 5.7.8+)
+    statement_timeout_ms = _env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    if statement_timeout_ms > 0 and database_uri().startswith('mysql'):
+        options['connect_args'] = {
+            'init_command': f'SET SESSION max_execution_time = {statement_timeout_ms}'
+        }
+
+    return options
+
+def configure_database(app):
+    """Point a Flask app's SQLAlchemy engine at the configured database"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options()
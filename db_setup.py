@@ -1,12 +1,14 @@
 
 from flask import Flask
-from models import db, User, SellerProfile, AdminProfile, Product, Message, CartItem, Order, OrderItem
+from models import db, User, SellerProfile, AdminProfile, Product, Message, CartItem, Order, OrderItem, ProductFacet, CatalogueVersion
+from db_config import configure_database
 from sqlalchemy import text
+from add_indexes import create_missing_indexes, merge_duplicate_cart_items
+from facets import rebuild_product_facets
 import os
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root:@localhost/kukuhub'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+configure_database(app)
 
 db.init_app(app)
 
@@ -68,6 +70,43 @@ def setup_database():
                         conn.execute(text("ALTER TABLE messages ADD COLUMN replied_at DATETIME NULL"))
                         print("Added replied_at column to messages table")
                     
+                    # Check and add the client-facing reference to payment_transactions;
+                    # existing rows reuse their CheckoutRequestID as the reference
+                    result = conn.execute(text("SHOW COLUMNS FROM payment_transactions LIKE 'reference'"))
+                    if not result.fetchone():
+                        conn.execute(text("ALTER TABLE payment_transactions ADD COLUMN reference VARCHAR(100) NULL"))
+                        conn.execute(text("UPDATE payment_transactions SET reference = checkout_request_id WHERE reference IS NULL"))
+                        conn.execute(text("ALTER TABLE payment_transactions MODIFY reference VARCHAR(100) NOT NULL, MODIFY checkout_request_id VARCHAR(100) NULL"))
+                        print("Added reference column to payment_transactions table")
+                    
+                    result = conn.execute(text("SHOW COLUMNS FROM payment_transactions LIKE 'order_id'"))
+                    if not result.fetchone():
+                        conn.execute(text("ALTER TABLE payment_transactions ADD COLUMN order_id VARCHAR(36) NULL, ADD FOREIGN KEY (order_id) REFERENCES orders(order_id)"))
+                        print("Added order_id column to payment_transactions table")
+                    
+                    # M-Pesa only takes whole shillings; round up any fractional amounts
+                    result = conn.execute(text("SHOW COLUMNS FROM payment_transactions LIKE 'amount'"))
+                    column = result.fetchone()
+                    if column and not column[1].lower().startswith('int'):
+                        conn.execute(text("UPDATE payment_transactions SET amount = CEIL(amount)"))
+                        conn.execute(text("ALTER TABLE payment_transactions MODIFY amount INT NOT NULL"))
+                        print("Changed payment_transactions.amount to whole shillings")
+                    
+                    # Unread counts match is_read = 0, so older rows need a value
+                    conn.execute(text("UPDATE messages SET is_read = 0 WHERE is_read IS NULL"))
+                    
+                    # Add secondary and unique indexes declared on the models
+                    merge_duplicate_cart_items(conn)
+                    create_missing_indexes(conn)
+                    
+                    # Seed the catalogue version so the first writes only ever update it
+                    if not conn.execute(CatalogueVersion.__table__.select().limit(1)).first():
+                        conn.execute(CatalogueVersion.__table__.insert().values(name='products', version=0))
+                    
+                    # Backfill facet counts the first time the table exists
+                    if not conn.execute(ProductFacet.__table__.select().limit(1)).first():
+                        rebuild_product_facets(conn)
+                    
                     conn.commit()
                     print("Database schema updated successfully!")
                     
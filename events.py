@@ -0,0 +1,168 @@
+
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from metrics import Counter, Gauge
+
+# In-process publish/subscribe for pushing message events to open
+# Server-Sent Events streams. Channels are plain strings such as
+# 'seller:12' or 'buyer:someone@example.com'.
+#
+# With EVENTS_SOCKET_DIR set, every worker process on the host binds a unix
+# datagram socket in that directory and publish() sends each event to all of
+# them, so a subscriber connected to one worker hears events published by
+# another. Without it, events reach subscribers in the publishing process only.
+EVENTS_SOCKET_DIR = os.environ.get('EVENTS_SOCKET_DIR')
+
+# Events a slow subscriber may fall behind by before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# An idle stream sends a comment this often so proxies keep it open, and
+# ends after STREAM_MAX_SECONDS; EventSource clients then reconnect
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_SECONDS = 300
+STREAM_RETRY_MS = 3000
+
+# Largest event datagram a worker will receive
+MAX_EVENT_BYTES = 256 * 1024
+
+EVENTS_PUBLISHED = Counter('events_published_total', 'Events published to the message push channel')
+EVENTS_DROPPED = Counter('events_dropped_total', 'Events dropped because a subscriber queue was full')
+EVENT_SUBSCRIBERS = Gauge('event_subscribers', 'Open event stream subscriptions in this process')
+
+class EventBroker:
+    """Deliver published events to the queues of a channel's subscribers"""
+
+    def __init__(self, fanout=None):
+        self.fanout = fanout
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        EVENT_SUBSCRIBERS.set_function(self.subscriber_count)
+
+    def subscribe(self, channel):
+        """Return a queue that receives every event published to channel"""
+        if self.fanout:
+            self.fanout.start(self.deliver)
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, channel, event):
+        EVENTS_PUBLISHED.inc()
+        if self.fanout:
+            self.fanout.publish(channel, event)
+        else:
+            self.deliver(channel, event)
+
+    def deliver(self, channel, event):
+        """Hand an event to this process's subscribers of channel"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                EVENTS_DROPPED.inc()
+
+class UnixSocketFanout:
+    """Share events between the worker processes on one host.
+
+    Each process binds <directory>/events-<pid>.sock on first use; publish()
+    sends the event to every socket in the directory, including this
+    process's own, and a listener thread hands received events to the
+    broker. Sockets left behind by dead workers are removed when a send to
+    them is refused.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._pid = None
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def start(self, deliver):
+        with self._lock:
+            # Bind again in a forked worker rather than sharing the parent's socket
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'events-{os.getpid()}.sock')
+            if os.path.exists(path):
+                os.unlink(path)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            listener.bind(path)
+            self._socket = listener
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._listen, args=(listener, deliver), name='events-fanout', daemon=True
+            ).start()
+
+    def publish(self, channel, event):
+        data = json.dumps([channel, event]).encode('utf-8')
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for path in glob.glob(os.path.join(self.directory, 'events-*.sock')):
+                try:
+                    sender.sendto(data, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    self._remove_stale(path)
+                except OSError as e:
+                    print(f"Error sending event to {path}: {str(e)}")
+        finally:
+            sender.close()
+
+    def _remove_stale(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _listen(self, listener, deliver):
+        while True:
+            data = listener.recv(MAX_EVENT_BYTES)
+            try:
+                channel, event = json.loads(data)
+                deliver(channel, event)
+            except Exception as e:
+                print(f"Error delivering event: {str(e)}")
+
+broker = EventBroker(UnixSocketFanout(EVENTS_SOCKET_DIR) if EVENTS_SOCKET_DIR else None)
+
+def seller_channel(seller_id):
+    return f'seller:{seller_id}'
+
+def buyer_channel(email):
+    return f'buyer:{email}'
+
+def event_stream(channel):
+    """Yield a channel's events in the text/event-stream format"""
+    subscriber = broker.subscribe(channel)
+    try:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                event = subscriber.get(timeout=STREAM_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(channel, subscriber)
@@ -0,0 +1,88 @@
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects.mysql import insert
+from models import db, Product, ProductFacet
+
+# Lower bounds (KES) of the price buckets shown on browse pages; the last
+# bucket is open-ended
+PRICE_BUCKETS = (0, 100, 500, 1000, 5000, 10000)
+
+def price_bucket(price):
+    """Lower bound of the price bucket a price falls into"""
+    bucket = PRICE_BUCKETS[0]
+    for bound in PRICE_BUCKETS:
+        if price >= bound:
+            bucket = bound
+    return bucket
+
+def adjust_product_facets(category, price, delta):
+    """Add delta to the counts of a product's category and price bucket.
+
+    Call in the same transaction as the product write so the counts commit
+    or roll back with it.
+    """
+    rows = [
+        {'facet': 'category', 'value': category, 'product_count': delta},
+        {'facet': 'price', 'value': str(price_bucket(price)), 'product_count': delta}
+    ]
+    statement = insert(ProductFacet.__table__).values(rows)
+    db.session.execute(statement.on_duplicate_key_update(
+        product_count=ProductFacet.__table__.c.product_count + statement.inserted.product_count
+    ))
+
+def product_added(product):
+    adjust_product_facets(product.category, product.price, 1)
+
+def product_removed(product):
+    adjust_product_facets(product.category, product.price, -1)
+
+def product_changed(old_category, old_price, product):
+    """Move a product between facets after its category or price changed"""
+    if old_category == product.category and price_bucket(old_price) == price_bucket(product.price):
+        return
+    adjust_product_facets(old_category, old_price, -1)
+    adjust_product_facets(product.category, product.price, 1)
+
+def get_product_facets():
+    """Return product counts per category and per price bucket"""
+    rows = db.session.execute(
+        select(ProductFacet.facet, ProductFacet.value, ProductFacet.product_count)
+        .where(ProductFacet.product_count > 0)
+    ).all()
+
+    categories = []
+    bucket_counts = {}
+    for facet, value, count in rows:
+        if facet == 'category':
+            categories.append({'category': value, 'count': count})
+        elif facet == 'price':
+            bucket_counts[int(value)] = count
+    categories.sort(key=lambda c: (-c['count'], c['category']))
+
+    prices = []
+    for index, bound in enumerate(PRICE_BUCKETS):
+        upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+        prices.append({'min': bound, 'max': upper, 'count': bucket_counts.get(bound, 0)})
+
+    return {'categories': categories, 'prices': prices}
+
+def rebuild_product_facets(conn):
+    """Recount every facet from the products table (backfill or repair)"""
+    bucket = case(
+        *[(Product.price >= bound, bound) for bound in reversed(PRICE_BUCKETS[1:])],
+        else_=PRICE_BUCKETS[0]
+    )
+    category_counts = conn.execute(
+        select(Product.category, func.count()).group_by(Product.category)
+    ).all()
+    price_counts = conn.execute(
+        select(bucket, func.count()).group_by(bucket)
+    ).all()
+
+    rows = [{'facet': 'category', 'value': category, 'product_count': count} for category, count in category_counts]
+    rows += [{'facet': 'price', 'value': str(bound), 'product_count': count} for bound, count in price_counts]
+
+    conn.execute(ProductFacet.__table__.delete())
+    if rows:
+        conn.execute(ProductFacet.__table__.insert(), rows)
+    print(f"Rebuilt {len(rows)} product facet count(s)")
@@ -0,0 +1,53 @@
+
+import hashlib
+from flask import Response, request
+from sqlalchemy import insert, select, update
+from models import db, CatalogueVersion, Product, SellerProfile
+from session_events import on_write_of
+
+# Clients may reuse a catalogue response only after revalidating it, which
+# costs a 304 with no body when nothing has changed
+CATALOGUE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+def catalogue_version():
+    """Current catalogue version: one primary-key read, cheap enough for every poll"""
+    version = db.session.execute(
+        select(CatalogueVersion.version).filter_by(name='products')
+    ).scalar()
+    return version or 0
+
+def bump_catalogue_version(connection):
+    """Move the catalogue version on, as part of connection's transaction.
+
+    A plain counter rather than a timestamp, so two writes in the same
+    second still give different versions.
+    """
+    table = CatalogueVersion.__table__
+    result = connection.execute(
+        update(table).where(table.c.name == 'products').values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(name='products', version=1))
+
+def make_etag(*parts):
+    """Strong ETag value for a response identified by parts"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds etag, otherwise None"""
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    return with_cache_headers(response, etag)
+
+def with_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = CATALOGUE_CACHE_CONTROL
+    return response
+
+# Product JSON embeds the seller's business name and email
+on_write_of((Product, SellerProfile), lambda session: bump_catalogue_version(session.connection()))
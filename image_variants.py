@@ -0,0 +1,68 @@
+
+import json
+import os
+from PIL import Image, ImageOps, features
+
+# Resized copies of each product image, generated in worker processes by
+# media_store.queue_image_variants(). Variants sit next to the original:
+# ab/cd/<sha256>-640w.webp, with ab/cd/<sha256>.variants.json listing what
+# exists. Nothing here touches Flask or the database, so it is cheap to
+# import into a worker process.
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# Encodings to produce, in order of preference, where Pillow supports them
+VARIANT_FORMATS = ('avif', 'webp')
+
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'avif': {'quality': 60},
+}
+
+def variant_name(name, width, image_format):
+    base, _ = os.path.splitext(name)
+    return f"{base}-{width}w.{image_format}"
+
+def manifest_name(name):
+    base, _ = os.path.splitext(name)
+    return f"{base}.variants.json"
+
+def _atomic_save(path, save):
+    partial = f"{path}.{os.getpid()}.partial"
+    save(partial)
+    os.replace(partial, path)
+
+def generate_variants(upload_folder, name):
+    """Write the resized variants of one stored image and return its manifest.
+
+    The manifest maps each format to [width label, actual width] pairs.
+    Images are never upscaled: the first width at or above the original's
+    is produced at the original width and larger ones are skipped.
+    """
+    formats = [image_format for image_format in VARIANT_FORMATS if features.check(image_format)]
+    manifest = {image_format: [] for image_format in formats}
+
+    with Image.open(os.path.join(upload_folder, name)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        for width in VARIANT_WIDTHS:
+            resized = image.copy()
+            resized.thumbnail((width, width * 10), Image.Resampling.LANCZOS)
+
+            for image_format in formats:
+                path = os.path.join(upload_folder, variant_name(name, width, image_format))
+                _atomic_save(path, lambda target: resized.save(
+                    target, format=image_format.upper(), **SAVE_OPTIONS[image_format]
+                ))
+                manifest[image_format].append([width, resized.width])
+
+            if width >= image.width:
+                break
+
+    _atomic_save(os.path.join(upload_folder, manifest_name(name)), lambda target: _write_json(target, manifest))
+    return manifest
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
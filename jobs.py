@@ -0,0 +1,150 @@
+
+import queue
+import random
+import threading
+import time
+from flask import current_app, has_app_context
+
+class RetryJob(Exception):
+    """Raised by a job to ask for another attempt after a backoff delay"""
+
+class JobQueue:
+    """In-process background job queue with retries and exponential backoff.
+
+    Jobs run on a small pool of daemon threads inside an app context, so
+    request threads hand work off and return immediately. A job that raises
+    RetryJob is scheduled again after an exponential delay with full jitter
+    (a random wait between 0 and base_delay * 2 ** (attempt - 1), capped at
+    max_delay). Retries are timers, so waiting jobs never occupy a worker.
+    Jobs live only in this process; anything the caller needs to survive a
+    restart should be recorded in the database by the job itself.
+    """
+
+    def __init__(self, name, workers=2, max_attempts=3, base_delay=1.0, max_delay=30.0):
+        self.name = name
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, on_failure=None, **kwargs):
+        """Queue func(*args, **kwargs); on_failure(error) runs if every attempt fails"""
+        app = current_app._get_current_object() if has_app_context() else None
+        self._start()
+        self._queue.put((app, func, args, kwargs, on_failure, 1))
+
+    def backoff_delay(self, attempt):
+        """Seconds to wait before retrying after the given failed attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def join(self):
+        """Block until every queued job (not counting pending retries) has run"""
+        self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(*job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, app, func, args, kwargs, on_failure, attempt):
+        context = app.app_context() if app else None
+        if context:
+            context.push()
+        try:
+            func(*args, **kwargs)
+        except RetryJob as e:
+            if attempt < self.max_attempts:
+                delay = self.backoff_delay(attempt)
+                print(f"{self.name}: attempt {attempt} of {func.__name__} failed ({e}), retrying in {delay:.1f}s")
+                timer = threading.Timer(
+                    delay, self._queue.put, [(app, func, args, kwargs, on_failure, attempt + 1)]
+                )
+                timer.daemon = True
+                timer.start()
+            else:
+                print(f"{self.name}: {func.__name__} failed after {attempt} attempts: {e}")
+                if on_failure:
+                    on_failure(e)
+        except Exception as e:
+            print(f"{self.name}: {func.__name__} failed: {str(e)}")
+            if on_failure:
+                on_failure(e)
+        finally:
+            if context:
+                context.pop()
+
+class MicroBatcher:
+    """Collect items from request threads and apply them in small batches.
+
+    A single daemon thread waits for the first item, keeps collecting until
+    max_batch items or max_wait seconds have passed, then calls
+    handler(batch) inside an app context. Like JobQueue, pending items live
+    only in this process.
+    """
+
+    def __init__(self, name, handler, max_batch=100, max_wait=0.05):
+        self.name = name
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._app = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        if self._app is None and has_app_context():
+            self._app = current_app._get_current_object()
+        self._start()
+        self._queue.put(item)
+
+    def join(self):
+        """Block until every submitted item has been handled"""
+        self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            context = self._app.app_context() if self._app else None
+            if context:
+                context.push()
+            try:
+                self.handler(batch)
+            except Exception as e:
+                print(f"{self.name}: failed to handle batch of {len(batch)}: {str(e)}")
+            finally:
+                if context:
+                    context.pop()
+                for _ in batch:
+                    self._queue.task_done()
@@ -0,0 +1,338 @@
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from models import db, Product
+from cache import LRUCache
+from image_variants import generate_variants, manifest_name, variant_name
+from response_cache import invalidate_products
+from http_cache import bump_catalogue_version
+
+# Uploaded product media is stored once per distinct content, under its
+# SHA-256: <UPLOAD_FOLDER>/ab/cd/abcd...<ext>. Uploads stream straight from
+# the request body into a temp file next to the store while being hashed,
+# so they are never held in memory and duplicates cost no extra space.
+MAX_IMAGE_BYTES = int(os.environ.get('MEDIA_MAX_IMAGE_BYTES', 5 * 1024 * 1024))
+MAX_VIDEO_BYTES = int(os.environ.get('MEDIA_MAX_VIDEO_BYTES', 100 * 1024 * 1024))
+
+# Whole request bodies above this are refused from Content-Length alone
+MAX_REQUEST_BYTES = MAX_IMAGE_BYTES + MAX_VIDEO_BYTES + 1024 * 1024
+
+IMAGE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+VIDEO_TYPES = {
+    'video/mp4': '.mp4',
+    'video/webm': '.webm',
+    'video/quicktime': '.mov',
+}
+
+CHUNK_SIZE = 64 * 1024
+
+# Stored media must be readable by whatever serves it (nginx, other users),
+# but temp files are created 0600. Read the umask once, while importing is
+# still single-threaded, since os.umask() can only be read by setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+STORED_FILE_MODE = 0o644 & ~_UMASK
+
+# Worker processes resizing product images, and the variant width served
+# as a product's plain 'image' URL
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+DEFAULT_IMAGE_WIDTH = 640
+
+_variant_pool = None
+_variant_pool_lock = threading.Lock()
+
+# Variant manifests already read from disk, by media name
+_manifests = LRUCache(4096, 3600)
+
+# Images found without a manifest (job still running or failed) are not
+# looked for again on disk for this many seconds
+MISSING_MANIFEST_TTL = 30
+_missing_manifests = LRUCache(4096, MISSING_MANIFEST_TTL)
+
+# Only content-addressed originals (see _store) ever get variants; older
+# uploads named by date and filename never will
+STORED_IMAGE_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+
+class MediaError(Exception):
+    """An upload was refused; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _too_large(max_bytes):
+    return MediaError(f'File is larger than {round(max_bytes / (1024 * 1024), 1):g} MB', 413)
+
+def _media_limit(content_type):
+    """Byte limit for an upload's declared MIME type, or None if not accepted"""
+    if content_type in IMAGE_TYPES:
+        return MAX_IMAGE_BYTES
+    if content_type in VIDEO_TYPES:
+        return MAX_VIDEO_BYTES
+    return None
+
+def _matches_signature(content_type, head):
+    """Check the file's leading bytes agree with its declared MIME type"""
+    if content_type == 'image/jpeg':
+        return head.startswith(b'\xff\xd8\xff')
+    if content_type == 'image/png':
+        return head.startswith(b'\x89PNG\r\n\x1a\n')
+    if content_type == 'image/gif':
+        return head.startswith((b'GIF87a', b'GIF89a'))
+    if content_type == 'image/webp':
+        return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+    if content_type in ('video/mp4', 'video/quicktime'):
+        return head[4:8] == b'ftyp'
+    if content_type == 'video/webm':
+        return head.startswith(b'\x1a\x45\xdf\xa3')
+    return False
+
+def _staging_folder():
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+class HashingUpload:
+    """Temp file that hashes and size-checks an upload as it is written.
+
+    The temp file is removed when closed, which Flask does at the end of
+    the request; store_upload() hard-links it into the store first.
+    """
+
+    def __init__(self, content_type, max_bytes):
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = tempfile.NamedTemporaryFile(dir=_staging_folder(), prefix='upload-')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise _too_large(self.max_bytes)
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        # read, seek, readline, flush, close, name, ...
+        return getattr(self._file, name)
+
+class MediaRequest(Request):
+    """Request that streams file uploads into HashingUpload temp files"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            # An empty file input; let Werkzeug keep it as usual
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        max_bytes = _media_limit(content_type)
+        if max_bytes is None:
+            raise MediaError(f'Unsupported file type: {content_type}', 415)
+        if content_length is not None and content_length > max_bytes:
+            raise _too_large(max_bytes)
+        return HashingUpload(content_type, max_bytes)
+
+    def _load_form_data(self):
+        try:
+            super()._load_form_data()
+        except RequestEntityTooLarge:
+            raise MediaError('Upload is too large', 413)
+
+def media_url(name):
+    return f"/static/uploads/{name}"
+
+def store_upload(file, allowed_types):
+    """Store an uploaded FileStorage by content hash and return its media name.
+
+    allowed_types maps the MIME types accepted here to file extensions
+    (IMAGE_TYPES, VIDEO_TYPES or both merged).
+    """
+    content_type = file.mimetype
+    if content_type not in allowed_types:
+        raise MediaError(f'Unsupported file type: {content_type}', 415)
+
+    upload = file.stream
+    if isinstance(upload, HashingUpload):
+        return _store(upload, allowed_types[content_type])
+
+    # Not streamed by MediaRequest; copy it through the hasher
+    upload = HashingUpload(content_type, _media_limit(content_type))
+    try:
+        shutil.copyfileobj(file.stream, upload, CHUNK_SIZE)
+        return _store(upload, allowed_types[content_type])
+    finally:
+        upload.close()
+
+def _store(upload, extension):
+    content_type = upload.content_type
+    upload.flush()
+
+    if upload.size == 0:
+        raise MediaError('File is empty')
+    upload.seek(0)
+    if not _matches_signature(content_type, upload.read(12)):
+        raise MediaError(f'File content does not match its type ({content_type})', 415)
+
+    digest = upload.hexdigest()
+    name = f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The link shares the temp file's inode, and so its mode
+        os.chmod(upload.name, STORED_FILE_MODE)
+        try:
+            os.link(upload.name, path)
+        except FileExistsError:
+            pass  # Stored by a concurrent upload of the same file
+        except OSError:
+            # Hard links unsupported here; copy beside the upload first so
+            # readers never see a partially written file
+            partial = f"{upload.name}.copy"
+            shutil.copyfile(upload.name, partial)
+            os.replace(partial, path)
+
+    return name
+
+def media_name(url):
+    """Media name for a URL served from the upload folder, or None"""
+    prefix = media_url('')
+    if url and url.startswith(prefix):
+        return url[len(prefix):]
+    return None
+
+def _get_variant_pool():
+    global _variant_pool
+    with _variant_pool_lock:
+        if _variant_pool is None:
+            # Spawned rather than forked: the parent has request threads running
+            _variant_pool = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _variant_pool
+
+def _discard_variant_pool(pool):
+    """Drop a broken pool so the next image starts a fresh one"""
+    global _variant_pool
+    with _variant_pool_lock:
+        if _variant_pool is pool:
+            _variant_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _submit_variants(upload_folder, name):
+    """Submit generate_variants for name; returns the pool and its future"""
+    pool = _get_variant_pool()
+    try:
+        return pool, pool.submit(generate_variants, upload_folder, name)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed while decoding a huge image); retry once
+        _discard_variant_pool(pool)
+        pool = _get_variant_pool()
+        return pool, pool.submit(generate_variants, upload_folder, name)
+
+def queue_image_variants(name):
+    """Generate the resized variants of a stored image in the background.
+
+    Never fails the upload: an image whose variants could not be queued is
+    served as uploaded.
+    """
+    if image_variants(name):
+        return  # Same image uploaded before
+    app = current_app._get_current_object()
+    upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    try:
+        pool, future = _submit_variants(upload_folder, name)
+    except Exception as e:
+        print(f"Error queueing variants for {name}: {str(e)}")
+        return
+    future.add_done_callback(lambda done: _variants_done(app, name, pool, done))
+
+def _variants_done(app, name, pool, future):
+    try:
+        manifest = future.result()
+    except BrokenProcessPool as e:
+        print(f"Error generating variants for {name}: {str(e)}")
+        _discard_variant_pool(pool)
+        return
+    except Exception as e:
+        print(f"Error generating variants for {name}: {str(e)}")
+        return
+
+    _manifests.set(name, manifest)
+    _missing_manifests.delete(name)
+    # Cached product responses and client ETags still reflect the original image only
+    with app.app_context():
+        product_ids = [
+            product_id for (product_id,) in
+            Product.query.with_entities(Product.product_id).filter_by(image_url=media_url(name))
+        ]
+        if product_ids:
+            bump_catalogue_version(db.session.connection())
+            db.session.commit()
+    invalidate_products(product_ids)
+
+def image_variants(name):
+    """Variant manifest for a stored image, or None if none were generated"""
+    if not STORED_IMAGE_NAME.match(name):
+        return None
+    manifest = _manifests.get(name)
+    if manifest is not None:
+        return manifest
+    if _missing_manifests.get(name):
+        return None
+    try:
+        with open(os.path.join(current_app.config['UPLOAD_FOLDER'], manifest_name(name))) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        _missing_manifests.set(name, True)
+        return None
+    _manifests.set(name, manifest)
+    return manifest
+
+def _srcset(name, variants, image_format):
+    return ', '.join(
+        f"{media_url(variant_name(name, width, image_format))} {actual_width}w"
+        for width, actual_width in variants
+    )
+
+def image_fields(image_url):
+    """Product image fields: 'image' plus responsive srcsets once variants exist.
+
+    'image' is the DEFAULT_IMAGE_WIDTH WebP variant (or the original until
+    variants are ready); 'imageSrcSet' lists every WebP width and
+    'imageAvifSrcSet' the AVIF ones, for a <picture> source.
+    """
+    fields = {'image': image_url, 'imageSrcSet': None, 'imageAvifSrcSet': None}
+    name = media_name(image_url)
+    manifest = image_variants(name) if name else None
+    if not manifest:
+        return fields
+
+    webp = manifest.get('webp')
+    if webp:
+        default_width = max(
+            (width for width, _ in webp if width <= DEFAULT_IMAGE_WIDTH), default=webp[0][0]
+        )
+        fields['image'] = media_url(variant_name(name, default_width, 'webp'))
+        fields['imageSrcSet'] = _srcset(name, webp, 'webp')
+    if manifest.get('avif'):
+        fields['imageAvifSrcSet'] = _srcset(name, manifest['avif'], 'avif')
+    return fields
@@ -0,0 +1,116 @@
+
+import threading
+
+# In-process metrics exposed at /metrics in the Prometheus text format.
+# Each gunicorn worker keeps its own values.
+
+_registry = []
+_registry_lock = threading.Lock()
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def samples(self):
+        """Return (name, value) pairs for this metric"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(f"{name} {_format_value(value)}" for name, value in self.samples())
+        return '\n'.join(lines)
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    metric_type = 'counter'
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self._value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        return [(self.name, self._value)]
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback when scraped"""
+    metric_type = 'gauge'
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def set_function(self, function):
+        self._function = function
+
+    @property
+    def value(self):
+        return self._function() if self._function else self._value
+
+    def samples(self):
+        return [(self.name, self.value)]
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    metric_type = 'histogram'
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    def samples(self):
+        with self._lock:
+            samples = [
+                (f'{self.name}_bucket{{le="{bound}"}}', count)
+                for bound, count in zip(self.buckets, self._counts)
+            ]
+            samples.append((f'{self.name}_bucket{{le="+Inf"}}', self._count))
+            samples.append((f'{self.name}_sum', self._sum))
+            samples.append((f'{self.name}_count', self._count))
+        return samples
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -50,16 +50,41 @@ class Product(db.Model):
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Float, nullable=False)
     stock = db.Column(db.Integer, nullable=False, default=0)
-    category = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(100), nullable=False, index=True)
     image_url = db.Column(db.String(255), nullable=True)
     video_url = db.Column(db.String(255), nullable=True)  # Added video support
     media_type = db.Column(db.String(20), default='image', nullable=False)  # 'image', 'video', or 'both'
     
-    seller_id = db.Column(db.Integer, db.ForeignKey('seller_profile.seller_id'), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey('seller_profile.seller_id'), nullable=False, index=True)
     seller = db.relationship('SellerProfile', backref=db.backref('products', lazy=True))
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Newest-first keyset pages of /api/products seek on (created_at, product_id);
+    # the full-text index is behind /api/products/search
+    __table_args__ = (
+        db.Index('ix_products_created_at', 'created_at', 'product_id'),
+        db.Index('ft_products_name_description_category', 'name', 'description', 'category', mysql_prefix='FULLTEXT'),
+    )
+
+# Product counts per category and per price bucket, kept in step with the
+# products table by facets.py so browse pages never scan every product
+class ProductFacet(db.Model):
+    __tablename__ = 'product_facets'
+    
+    facet = db.Column(db.String(20), primary_key=True)  # 'category' or 'price'
+    value = db.Column(db.String(100), primary_key=True)  # Category name, or the price bucket's lower bound
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+
+# Counter bumped inside every transaction that writes products or sellers,
+# and when a product image's variants are ready, so catalogue ETags can be
+# checked with one primary-key read before anything is loaded or serialized
+class CatalogueVersion(db.Model):
+    __tablename__ = 'catalogue_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
 
 class Message(db.Model):
     __tablename__ = 'messages'
@@ -90,6 +115,14 @@ class Message(db.Model):
     
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Seller inbox and buyer message history are both listed newest first;
+    # the seller's unread badge is a count over (seller_id, is_read)
+    __table_args__ = (
+        db.Index('ix_messages_seller_id_created_at', 'seller_id', 'created_at'),
+        db.Index('ix_messages_senderEmail_created_at', 'senderEmail', 'created_at'),
+        db.Index('ix_messages_seller_id_is_read', 'seller_id', 'is_read'),
+    )
 
 # Cart and Order Models
 class CartItem(db.Model):
@@ -105,6 +138,12 @@ class CartItem(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # One row per product in a user's cart; cart changes upsert against this
+    # key, and it also serves lookups of a user's cart by user_id
+    __table_args__ = (
+        db.Index('uq_cart_items_user_id_product_id', 'user_id', 'product_id', unique=True),
+    )
 
 class Order(db.Model):
     __tablename__ = 'orders'
@@ -118,6 +157,13 @@ class Order(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Order history (per user), the admin list and its status filter list newest first
+    __table_args__ = (
+        db.Index('ix_orders_created_at', 'created_at', 'order_id'),
+        db.Index('ix_orders_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+    )
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
@@ -128,10 +174,35 @@ class OrderItem(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)  # Price at time of purchase
     
-    # Composite primary key for order_id and product_id
+    # Composite primary key for order_id and product_id; order_id leads,
+    # so the primary key also serves lookups of an order's items
     __table_args__ = (
         db.PrimaryKeyConstraint('order_id', 'product_id'),
     )
     
     order = db.relationship('Order', backref=db.backref('items', lazy=True))
     product = db.relationship('Product', backref=db.backref('order_items', lazy=True))
+
+# M-Pesa payments
+class PaymentTransaction(db.Model):
+    __tablename__ = 'payment_transactions'
+    
+    transaction_id = db.Column(db.Integer, primary_key=True)
+    reference = db.Column(db.String(100), unique=True, index=True, nullable=False)  # Our id, returned to the client
+    checkout_request_id = db.Column(db.String(100), unique=True, index=True, nullable=True)  # Set once M-Pesa accepts the push
+    merchant_request_id = db.Column(db.String(100), nullable=True)
+    order_id = db.Column(db.String(36), db.ForeignKey('orders.order_id'), nullable=True)  # Order paid for, if known
+    phone_number = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)  # Whole shillings; M-Pesa takes no cents
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued, pending, completed, failed
+    result_code = db.Column(db.Integer, nullable=True)
+    result_desc = db.Column(db.String(255), nullable=True)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Pending payments are looked up by status, and old rows are purged by age
+    __table_args__ = (
+        db.Index('ix_payment_transactions_status_created_at', 'status', 'created_at'),
+        db.Index('ix_payment_transactions_created_at', 'created_at'),
+    )
@@ -0,0 +1,58 @@
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+def get_page_limit(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read the 'limit' query parameter, clamped to 1..maximum"""
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque URL-safe token"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode('utf-8').rstrip('=')
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # Ids are integers, or UUID strings for orders
+        if not isinstance(created_at, str) or isinstance(row_id, bool) or not isinstance(row_id, (int, str)):
+            raise ValueError("Cursor position has the wrong types")
+        return datetime.fromisoformat(created_at), row_id
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+def paginate_keyset(query, created_col, id_col, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one newest-first page of rows and the cursor for the next page.
+
+    The query seeks directly past the cursor on (created_at, id) instead of
+    using OFFSET, so every page costs the same no matter how deep it is.
+    """
+    query = query.order_by(created_col.desc(), id_col.desc())
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_col < created_at,
+            and_(created_col == created_at, id_col < row_id)
+        ))
+
+    # Fetch one extra row to find out whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
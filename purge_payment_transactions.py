@@ -0,0 +1,20 @@
+
+from app import app
+from routes.mpesa import purge_expired_transactions, TRANSACTION_TTL_DAYS
+import sys
+
+def purge_payment_transactions(ttl_days=TRANSACTION_TTL_DAYS):
+    """Remove M-Pesa transactions older than ttl_days (run periodically, e.g. from cron)"""
+    with app.app_context():
+        try:
+            removed = purge_expired_transactions(ttl_days)
+            print(f"Purged {removed} payment transaction(s) older than {ttl_days} days")
+            return True
+        except Exception as e:
+            print(f"Error purging payment transactions: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    # Usage: python purge_payment_transactions.py [ttl_days]
+    ttl_days = int(sys.argv[1]) if len(sys.argv) > 1 else TRANSACTION_TTL_DAYS
+    purge_payment_transactions(ttl_days)
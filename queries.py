@@ -0,0 +1,76 @@
+
+import re
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import joinedload
+from models import db, Product, CartItem, Order, OrderItem, Message
+
+# Shared query builders that load related rows up front, so list endpoints
+# run a fixed number of queries instead of one extra lookup per row.
+
+def products_with_seller():
+    """Product query with each product's seller joined in the same SELECT"""
+    return Product.query.options(joinedload(Product.seller))
+
+def cart_items_with_products(user_id):
+    """Cart items for a user with their products and sellers joined in"""
+    return CartItem.query.filter_by(user_id=user_id).options(
+        joinedload(CartItem.product).joinedload(Product.seller)
+    )
+
+def orders_with_user():
+    """Order query with each order's buyer joined in the same SELECT"""
+    return Order.query.options(joinedload(Order.user))
+
+def load_order_items(orders):
+    """Fetch the items and products for a batch of orders in one query.
+
+    Returns a dict of order_id -> list of OrderItem (with .product loaded),
+    so callers can build order JSON in memory without per-order lookups.
+    """
+    items_by_order = {order.order_id: [] for order in orders}
+    if not items_by_order:
+        return items_by_order
+    
+    items = OrderItem.query.filter(OrderItem.order_id.in_(list(items_by_order))).options(
+        joinedload(OrderItem.product)
+    ).all()
+    
+    for item in items:
+        items_by_order[item.order_id].append(item)
+    
+    return items_by_order
+
+def count_unread_messages(seller_id):
+    """Unread messages for a seller, counted from the (seller_id, is_read) index alone"""
+    return db.session.query(func.count(Message.message_id)).filter_by(
+        seller_id=seller_id, is_read=False
+    ).scalar()
+
+def search_products(search_text, category=None, min_price=None, max_price=None):
+    """Product query (seller joined) for a catalogue search, best matches first.
+
+    Words in search_text are matched as prefixes against the FULLTEXT index
+    on name, description and category, so 'chick' finds 'chicken'. Without
+    search text the filters alone apply and the newest products come first.
+    """
+    query = products_with_seller()
+    
+    if category:
+        query = query.filter(Product.category == category)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    
+    # Keep letters and digits only, so user input cannot inject boolean-mode operators
+    terms = re.findall(r'\w+', search_text or '')
+    if not terms:
+        return query.order_by(Product.created_at.desc(), Product.product_id.desc())
+    
+    relevance = match(
+        Product.name, Product.description, Product.category,
+        against=' '.join(f'{term}*' for term in terms)
+    ).in_boolean_mode()
+    
+    return query.filter(relevance > 0).order_by(relevance.desc(), Product.product_id.desc())
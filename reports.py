@@ -0,0 +1,57 @@
+
+import csv
+import io
+from datetime import datetime
+from flask import Response, stream_with_context
+
+# Rows fetched per database round trip, and written per chunk, while streaming
+REPORT_BATCH_SIZE = 500
+
+# MySQL optimizer hint lifting DB_STATEMENT_TIMEOUT_MS for one SELECT. A
+# streamed report keeps its statement open until the last row is sent, so
+# the session-wide max_execution_time would cut large downloads short.
+NO_TIMEOUT_HINT = '/*+ MAX_EXECUTION_TIME(0) */'
+
+def report_query(query):
+    """Stream query's rows in batches of REPORT_BATCH_SIZE, without the SELECT timeout"""
+    return query.prefix_with(NO_TIMEOUT_HINT, dialect='mysql').yield_per(REPORT_BATCH_SIZE)
+
+def stream_csv_report(name, headers, rows):
+    """Stream a CSV download built from an iterable of row lists.
+
+    The header goes out as the first chunk and rows follow in batches of
+    REPORT_BATCH_SIZE, so neither the result set nor the file is held in
+    memory. The request context is kept alive until the last chunk so the
+    rows can keep reading from the database session.
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(headers)
+        yield _drain(buffer)
+
+        try:
+            for count, row in enumerate(rows, 1):
+                writer.writerow(row)
+                if count % REPORT_BATCH_SIZE == 0:
+                    yield _drain(buffer)
+        except Exception as e:
+            print(f"Error streaming {name} report: {str(e)}")
+            raise
+
+        yield _drain(buffer)
+
+    filename = f'{name}_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def _drain(buffer):
+    """Return everything written to buffer so far and reset it"""
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return data
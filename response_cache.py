@@ -0,0 +1,129 @@
+
+import json
+import os
+import uuid
+from flask import Response
+from models import Product, SellerProfile
+from cache import LRUCache
+from http_cache import not_modified, with_cache_headers
+from metrics import Counter
+from session_events import on_commit_of
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Serialized public product responses, shared across workers when
+# RESPONSE_CACHE_URL points at a Redis-compatible server and kept per
+# process otherwise. Product writes invalidate entries on commit; the TTL
+# bounds staleness for anything invalidation misses (for example another
+# worker's in-process cache).
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+
+CACHE_HITS = Counter('response_cache_hits_total', 'Product responses served from the response cache')
+CACHE_MISSES = Counter('response_cache_misses_total', 'Product responses built from the database')
+
+class LRUBackend:
+    """In-process backend; each worker keeps its own entries"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL):
+        self._cache = LRUCache(max_entries, ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+class RedisBackend:
+    """Backend on any client with Redis's get/set(ex=)/delete methods.
+
+    Errors talking to the server are logged and treated as cache misses,
+    so an unavailable cache slows requests down instead of failing them.
+    """
+
+    def __init__(self, client, prefix='kukuhub:', ttl=RESPONSE_CACHE_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Response cache get failed: {str(e)}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            print(f"Response cache set failed: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            print(f"Response cache delete failed: {str(e)}")
+
+def make_backend():
+    """Backend chosen by RESPONSE_CACHE_URL, falling back to the in-process LRU"""
+    url = os.environ.get('RESPONSE_CACHE_URL')
+    if not url:
+        return LRUBackend()
+    if redis is None:
+        print("RESPONSE_CACHE_URL is set but the redis package is not installed; using the in-process cache")
+        return LRUBackend()
+    return RedisBackend(redis.Redis.from_url(url))
+
+response_cache = make_backend()
+
+def product_detail_key(product_id):
+    return f"products:detail:{product_id}"
+
+def product_list_key(limit, cursor):
+    # List pages overlap, so they are invalidated together by moving to a
+    # new generation rather than deleted one by one
+    generation = response_cache.get('products:list-generation')
+    if generation is None:
+        generation = uuid.uuid4().hex
+        response_cache.set('products:list-generation', generation)
+    return f"products:list:{generation}:{limit}:{cursor or ''}"
+
+def get_cached_response(key):
+    """Return the cached response for key (a 304 if the client has it), or None"""
+    entry = response_cache.get(key)
+    if entry is None:
+        CACHE_MISSES.inc()
+        return None
+    CACHE_HITS.inc()
+    return not_modified(entry['etag']) or with_cache_headers(
+        Response(entry['body'], mimetype='application/json'), entry['etag']
+    )
+
+def cache_response(key, response, etag):
+    response_cache.set(key, {'body': response.get_data(as_text=True), 'etag': etag})
+    return response
+
+def invalidate_products(product_ids):
+    """Drop cached responses that may include any of the given products"""
+    for product_id in product_ids:
+        response_cache.delete(product_detail_key(product_id))
+    response_cache.delete('products:list-generation')
+
+def _invalidate_written_products(written):
+    invalidate_products([product_id for _, product_id in written])
+
+def _invalidate_product_lists(written):
+    # List entries embed seller business names; product details that do
+    # are left to expire with the TTL
+    response_cache.delete('products:list-generation')
+
+on_commit_of(Product, _invalidate_written_products)
+on_commit_of(SellerProfile, _invalidate_product_lists)
@@ -0,0 +1,110 @@
+
+from flask import Blueprint, Response, abort, current_app, request
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+import mimetypes
+import os
+import re
+
+media_routes = Blueprint('media', __name__)
+
+# Uploaded product media is served here instead of by Flask's static
+# handler. This rule is more specific than /static/<path:filename>, so it
+# wins for every upload URL already stored on products.
+
+# Content-addressed names (and their variants) never change content, so
+# browsers may keep them for a year without revalidating
+HASHED_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(-\d+w)?\.[a-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=3600'
+
+# When set (e.g. '/_media/'), nginx serves the file itself: we answer with
+# an X-Accel-Redirect to an internal location aliased to the upload folder
+ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+
+READ_CHUNK_SIZE = 64 * 1024
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+
+def _read_range(f, length):
+    """Yield length bytes from f's current position, then close it"""
+    try:
+        while length > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+@media_routes.route('/static/uploads/<path:name>', methods=['GET'])
+def serve_media(name):
+    """Serve an uploaded image or video, honouring Range requests"""
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    path = safe_join(upload_folder, name)
+    if path is None:
+        abort(404)
+    # Checked on the normalised path so './tmp/..' or 'x/../tmp/..' cannot
+    # reach uploads still being staged
+    path = os.path.abspath(path)
+    staging = os.path.join(upload_folder, 'tmp')
+    if os.path.commonpath([path, staging]) == staging or not os.path.isfile(path):
+        abort(404)
+    name = os.path.relpath(path, upload_folder).replace(os.sep, '/')
+
+    stat = os.stat(path)
+    hashed = HASHED_NAME.match(name)
+    etag = f"{hashed.group(1)}{hashed.group(2) or ''}" if hashed else f"{int(stat.st_mtime)}-{stat.st_size}"
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    headers = {
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if hashed else MUTABLE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    if ACCEL_REDIRECT_PREFIX:
+        headers['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + name
+        response = Response(mimetype=mimetype, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    size = stat.st_size
+    start, stop, status = 0, size, 200
+
+    # Only single byte ranges are served; multi-range and other-unit
+    # requests get the whole file. Ignore the Range too if an If-Range
+    # validator no longer matches.
+    byte_range = None
+    if (
+        request.range and request.range.units == 'bytes' and len(request.range.ranges) == 1
+        and ('If-Range' not in request.headers or request.if_range.etag == etag)
+    ):
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+    if byte_range:
+        start, stop = byte_range
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    f = open(path, 'rb')
+    f.seek(start)
+    if stop == size:
+        # Through the server's wsgi.file_wrapper, which gunicorn sends with
+        # os.sendfile from the current offset
+        body = wrap_file(request.environ, f, READ_CHUNK_SIZE)
+    else:
+        body = _read_range(f, stop - start)
+
+    response = Response(body, status=status, mimetype=mimetype, headers=headers, direct_passthrough=True)
+    response.content_length = stop - start
+    response.set_etag(etag)
+    return response
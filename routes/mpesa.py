@@ -1,11 +1,22 @@
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session
 import requests
+from requests.adapters import HTTPAdapter
 import base64
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import functools
+import math
+import os
 import socket
+import threading
 import time
+import uuid
+from sqlalchemy import or_
+from models import db, Order, PaymentTransaction
+from metrics import Counter, Histogram
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from jobs import JobQueue, MicroBatcher, RetryJob
 
 mpesa_routes = Blueprint('mpesa', __name__)
 
@@ -18,24 +29,53 @@ PASSKEY = "bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919"  #
 # For production, use your actual domain
 CALLBACK_URL = "https://webhook.site/3c1f62b5-4214-47d6-9f26-71c1f4b9c8f0"  # Use a webhook.site URL for testing
 
-# M-Pesa API endpoints
-API_BASE_URL = "https://sandbox.safaricom.co.ke"
+# M-Pesa API endpoints (MPESA_API_BASE_URL can point at a local stub server)
+API_BASE_URL = os.environ.get('MPESA_API_BASE_URL', "https://sandbox.safaricom.co.ke")
 AUTH_ENDPOINT = "/oauth/v1/generate"
 STK_PUSH_ENDPOINT = "/mpesa/stkpush/v1/processrequest"
 
-# Store transaction details in memory (in a real app, you'd use a database)
-TRANSACTIONS = {}
+# Transactions older than this are removed by purge_expired_transactions()
+TRANSACTION_TTL_DAYS = 30
+PURGE_BATCH_SIZE = 1000
 
-# Max retries for API calls
+# All Daraja calls share one keep-alive connection pool
+CONNECT_TIMEOUT = 5  # seconds
+READ_TIMEOUT = 30  # seconds
+http_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=10)
+http_session.mount('https://', _adapter)
+http_session.mount('http://', _adapter)
+
+# Stop calling Daraja for a while after repeated 5xx responses or timeouts
+mpesa_breaker = CircuitBreaker('mpesa', failure_threshold=5, reset_timeout=30)
+
+OAUTH_REQUEST_SECONDS = Histogram('mpesa_oauth_request_seconds', 'Latency of M-Pesa OAuth requests')
+STK_PUSH_REQUEST_SECONDS = Histogram('mpesa_stk_push_request_seconds', 'Latency of M-Pesa STK push requests')
+
+# Access tokens are reused until this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 60
+_token_lock = threading.Lock()
+_cached_token = {'access_token': None, 'expires_at': 0.0}
+
+TOKEN_CACHE_HITS = Counter('mpesa_token_cache_hits_total', 'STK pushes that reused a cached access token')
+TOKEN_REFRESHES = Counter('mpesa_token_refreshes_total', 'Access tokens fetched from the M-Pesa OAuth endpoint')
+
+# Outbound STK pushes run on a background queue so request threads never
+# wait on Daraja; failed attempts are retried with exponential backoff
 MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+RETRY_BASE_DELAY = 2  # seconds
+RETRY_MAX_DELAY = 30  # seconds
+stk_push_queue = JobQueue('mpesa-stk', workers=2, max_attempts=MAX_RETRIES,
+                          base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY)
 
 @mpesa_routes.route('/stkpush', methods=['POST'])
 def initiate_stk_push():
+    """Queue an STK push and return a reference the client can poll at /status/<id>"""
     try:
         data = request.json
         phone_number = data.get('phoneNumber')
-        amount = data.get('amount', 1)  # Default to 1 if not provided
+        amount = _whole_shillings(data.get('amount', 1))  # Default to 1 if not provided
+        order_id = data.get('orderId')  # Optional order this payment is for
         
         if not phone_number:
             return jsonify({
@@ -43,182 +83,313 @@ def initiate_stk_push():
                 'message': 'Phone number is required'
             }), 400
         
-        # Get access token with retry
-        access_token = None
-        retry_count = 0
-        auth_error = None
-        
-        while retry_count < MAX_RETRIES and access_token is None:
-            access_token_result = get_access_token()
-            if 'access_token' in access_token_result:
-                access_token = access_token_result['access_token']
-                break
-            else:
-                auth_error = access_token_result.get('error')
-                print(f"Auth attempt {retry_count + 1} failed: {auth_error}")
-                retry_count += 1
-                if retry_count < MAX_RETRIES:
-                    time.sleep(RETRY_DELAY)
-        
-        if access_token is None:
+        if amount is None or amount < 1:
             return jsonify({
                 'success': False,
-                'message': 'Could not authenticate with M-Pesa service',
-                'details': auth_error
-            }), 503  # Service Unavailable
-        
-        # Prepare timestamp
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        
-        # Generate password - format: BusinessShortCode+Passkey+Timestamp
-        password = base64.b64encode(f"{BUSINESS_SHORT_CODE}{PASSKEY}{timestamp}".encode()).decode('utf-8')
-        
-        # Prepare STK push request
-        stk_request = {
-            "BusinessShortCode": BUSINESS_SHORT_CODE,
-            "Password": password,
-            "Timestamp": timestamp,
-            "TransactionType": "CustomerPayBillOnline",
-            "Amount": amount,
-            "PartyA": phone_number,
-            "PartyB": BUSINESS_SHORT_CODE,
-            "PhoneNumber": phone_number,
-            "CallBackURL": CALLBACK_URL,
-            "AccountReference": "KukuHub",
-            "TransactionDesc": "Payment for products"
-        }
+                'message': 'Amount must be a whole number of shillings'
+            }), 400
         
-        print(f"Sending M-Pesa request with callback URL: {CALLBACK_URL}")
+        if order_id:
+            # A payment for an order is for that order's total, and only the
+            # buyer may pay for it while it is still awaiting payment
+            order = db.session.get(Order, order_id)
+            if not order or order.user_id != session.get('user_id'):
+                return jsonify({
+                    'success': False,
+                    'message': 'Order not found'
+                }), 400
+            if order.status != 'Pending':
+                return jsonify({
+                    'success': False,
+                    'message': f'Order is {order.status} and cannot be paid for'
+                }), 400
+            # M-Pesa takes whole shillings, so a fractional total is rounded up
+            order_amount = math.ceil(order.total)
+            if 'amount' in data and amount != order_amount:
+                return jsonify({
+                    'success': False,
+                    'message': 'Amount does not match the order total'
+                }), 400
+            amount = order_amount
         
-        # Make request to M-Pesa API with retry
-        stk_response = None
-        stk_error = None
-        retry_count = 0
+        # Record the payment before handing it to the queue, so its status is
+        # visible to every worker from the start
+        reference = str(uuid.uuid4())
+        transaction = PaymentTransaction(
+            reference=reference,
+            order_id=order_id,
+            phone_number=phone_number,
+            amount=amount,
+            status='queued'
+        )
+        db.session.add(transaction)
+        db.session.commit()
         
-        while retry_count < MAX_RETRIES and stk_response is None:
-            try:
-                response = requests.post(
-                    f"{API_BASE_URL}{STK_PUSH_ENDPOINT}",
-                    json=stk_request,
-                    headers={
-                        "Authorization": f"Bearer {access_token}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=30,
-                    verify=True  # Enable SSL verification
-                )
-                
-                print(f"M-Pesa API Response Status: {response.status_code}")
-                print(f"M-Pesa API Response: {response.text}")
-                
-                if response.status_code == 200:
-                    try:
-                        stk_response = response.json()
-                    except json.JSONDecodeError:
-                        stk_error = "Invalid JSON response from M-Pesa"
-                elif response.status_code == 503:
-                    stk_error = "M-Pesa service is temporarily unavailable"
-                else:
-                    stk_error = f"M-Pesa API returned status code {response.status_code}: {response.text}"
-                
-                if stk_response is None:
-                    retry_count += 1
-                    if retry_count < MAX_RETRIES:
-                        print(f"Retrying STK push, attempt {retry_count + 1}")
-                        time.sleep(RETRY_DELAY)
-            except requests.exceptions.RequestException as e:
-                stk_error = str(e)
-                retry_count += 1
-                if retry_count < MAX_RETRIES:
-                    print(f"Request exception, retrying: {stk_error}")
-                    time.sleep(RETRY_DELAY)
+        stk_push_queue.submit(
+            send_stk_push, reference,
+            on_failure=functools.partial(mark_stk_push_failed, reference)
+        )
         
-        if stk_response is None:
-            error_message = "Unable to complete payment request"
-            if stk_error:
-                error_message += f": {stk_error}"
-            
-            return jsonify({
-                'success': False,
-                'message': error_message
-            }), 503
-                
-        if 'ResponseCode' in stk_response and stk_response['ResponseCode'] == '0':
-            # Success - store transaction
-            checkout_request_id = stk_response['CheckoutRequestID']
-            TRANSACTIONS[checkout_request_id] = {
-                'amount': amount,
-                'phone_number': phone_number,
-                'status': 'pending',
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            return jsonify({
-                'success': True,
-                'message': 'Payment request sent successfully. Please check your phone.',
-                'checkoutRequestID': checkout_request_id
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Failed to initiate payment request',
-                'details': stk_response
-            }), 400
+        return jsonify({
+            'success': True,
+            'message': 'Payment request is being sent. Please check your phone.',
+            'checkoutRequestID': reference,
+            'status': 'queued'
+        }), 202
             
     except Exception as e:
+        db.session.rollback()
         print(f"STK push error: {str(e)}")
         return jsonify({
             'success': False,
             'message': 'An error occurred while processing your payment request'
         }), 500
 
+def _whole_shillings(amount):
+    """amount as an int if it is a whole number (100, 100.0 or "100"), else None"""
+    if isinstance(amount, bool):
+        return None
+    try:
+        value = float(amount)
+    except (TypeError, ValueError):
+        return None
+    if not value.is_integer():
+        return None
+    return int(value)
+
+def send_stk_push(reference):
+    """Background job: send one STK push attempt for a queued transaction.
+
+    Raises RetryJob for failures worth retrying (auth errors, 5xx, timeouts);
+    any other failure marks the transaction failed straight away.
+    """
+    transaction = PaymentTransaction.query.filter_by(reference=reference).first()
+    if not transaction or transaction.status != 'queued':
+        return
+    
+    access_token_result = get_access_token()
+    if 'access_token' not in access_token_result:
+        raise RetryJob(f"Could not authenticate with M-Pesa service: {access_token_result.get('error')}")
+    access_token = access_token_result['access_token']
+    
+    # Prepare timestamp
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    
+    # Generate password - format: BusinessShortCode+Passkey+Timestamp
+    password = base64.b64encode(f"{BUSINESS_SHORT_CODE}{PASSKEY}{timestamp}".encode()).decode('utf-8')
+    
+    # Prepare STK push request
+    stk_request = {
+        "BusinessShortCode": BUSINESS_SHORT_CODE,
+        "Password": password,
+        "Timestamp": timestamp,
+        "TransactionType": "CustomerPayBillOnline",
+        "Amount": int(transaction.amount),
+        "PartyA": transaction.phone_number,
+        "PartyB": BUSINESS_SHORT_CODE,
+        "PhoneNumber": transaction.phone_number,
+        "CallBackURL": CALLBACK_URL,
+        "AccountReference": "KukuHub",
+        "TransactionDesc": "Payment for products"
+    }
+    
+    print(f"Sending M-Pesa request with callback URL: {CALLBACK_URL}")
+    
+    try:
+        response = mpesa_request(
+            'POST', STK_PUSH_ENDPOINT, STK_PUSH_REQUEST_SECONDS,
+            json=stk_request,
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            }
+        )
+    except CircuitOpenError as e:
+        raise RetryJob(str(e))
+    except requests.exceptions.RequestException as e:
+        raise RetryJob(f"Request error: {str(e)}")
+    
+    print(f"M-Pesa API Response Status: {response.status_code}")
+    print(f"M-Pesa API Response: {response.text}")
+    
+    if response.status_code == 401:
+        # Token was revoked or expired early; the retry fetches a fresh one
+        invalidate_access_token()
+        raise RetryJob("M-Pesa rejected the access token")
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryJob(f"M-Pesa API returned status code {response.status_code}")
+    
+    try:
+        stk_response = response.json()
+    except json.JSONDecodeError:
+        raise RetryJob("Invalid JSON response from M-Pesa")
+    
+    if response.status_code == 200 and stk_response.get('ResponseCode') == '0':
+        # Accepted - M-Pesa will report the outcome to the callback URL
+        transaction.checkout_request_id = stk_response['CheckoutRequestID']
+        transaction.merchant_request_id = stk_response.get('MerchantRequestID')
+        transaction.status = 'pending'
+    else:
+        transaction.status = 'failed'
+        transaction.result_desc = str(
+            stk_response.get('errorMessage') or stk_response.get('ResponseDescription') or stk_response
+        )[:255]
+    
+    db.session.commit()
+
+def mark_stk_push_failed(reference, error):
+    """Record that every attempt to send an STK push failed"""
+    db.session.rollback()
+    transaction = PaymentTransaction.query.filter_by(reference=reference).first()
+    if transaction and transaction.status == 'queued':
+        transaction.status = 'failed'
+        transaction.result_desc = str(error)[:255]
+        db.session.commit()
+
 @mpesa_routes.route('/callback', methods=['POST'])
 def mpesa_callback():
-    """Handle M-Pesa callback after STK push"""
+    """Acknowledge an M-Pesa callback at once and apply it in the background"""
     try:
         callback_data = request.json
         print(f"M-Pesa Callback Data: {json.dumps(callback_data, indent=2)}")
         
         # Extract relevant information from the callback data
-        checkout_request_id = callback_data.get('Body', {}).get('stkCallback', {}).get('CheckoutRequestID')
-        result_code = callback_data.get('Body', {}).get('stkCallback', {}).get('ResultCode')
-        result_desc = callback_data.get('Body', {}).get('stkCallback', {}).get('ResultDesc')
+        stk_callback = callback_data.get('Body', {}).get('stkCallback', {})
+        checkout_request_id = stk_callback.get('CheckoutRequestID')
+        result_code = stk_callback.get('ResultCode')
+        result_desc = stk_callback.get('ResultDesc')
         
         # Log the callback data and result
         print(f"Callback received for CheckoutRequestID: {checkout_request_id}, ResultCode: {result_code}, ResultDesc: {result_desc}")
         
-        # Check if the transaction exists
-        if checkout_request_id in TRANSACTIONS:
-            # Update transaction status based on the callback
-            if result_code == 0:
-                TRANSACTIONS[checkout_request_id]['status'] = 'completed'
-                print(f"Transaction {checkout_request_id} completed successfully.")
-            else:
-                TRANSACTIONS[checkout_request_id]['status'] = 'failed'
-                print(f"Transaction {checkout_request_id} failed. Result Description: {result_desc}")
-            
-            # You can add more detailed handling here, such as updating a database
-            # or sending notifications to users.
-            
-            return jsonify({'success': True, 'message': 'Callback processed successfully'}), 200
-        else:
-            print(f"Transaction with CheckoutRequestID {checkout_request_id} not found.")
-            return jsonify({'success': False, 'message': 'Transaction not found'}), 404
+        if not checkout_request_id:
+            return jsonify({'success': False, 'message': 'CheckoutRequestID is required'}), 400
+        
+        callback_batcher.submit({
+            'checkout_request_id': checkout_request_id,
+            'result_code': result_code,
+            'result_desc': result_desc
+        })
+        
+        return jsonify({'success': True, 'message': 'Callback accepted'}), 200
     
     except Exception as e:
         print(f"Callback processing error: {str(e)}")
         return jsonify({'success': False, 'message': f'An error occurred: {str(e)}'}), 500
 
+def apply_callbacks(callbacks):
+    """Apply a batch of callbacks in one transaction.
+
+    Only transactions still queued or pending are touched, and they are
+    locked while being updated, so a duplicate callback (in this batch, a
+    later one, or on another worker) finds nothing to do. Orders linked to
+    a completed payment move from Pending to Processing in the same commit.
+    Callbacks for a CheckoutRequestID not recorded yet are retried later.
+    """
+    # Keep the first callback for each CheckoutRequestID
+    by_checkout_id = {}
+    for callback in callbacks:
+        by_checkout_id.setdefault(callback['checkout_request_id'], callback)
+    
+    unmatched = set()
+    try:
+        unmatched = _apply_callbacks(by_checkout_id)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Callback batch failed, applying one at a time: {str(e)}")
+        for checkout_request_id, callback in by_checkout_id.items():
+            try:
+                unmatched |= _apply_callbacks({checkout_request_id: callback})
+            except Exception as e:
+                db.session.rollback()
+                print(f"Callback for {checkout_request_id} failed: {str(e)}")
+    
+    for checkout_request_id in unmatched:
+        unmatched_callback_queue.submit(
+            apply_unmatched_callback, by_checkout_id[checkout_request_id],
+            on_failure=functools.partial(drop_unmatched_callback, checkout_request_id)
+        )
+
+def apply_unmatched_callback(callback):
+    """Background job: apply a callback that arrived before its transaction had a CheckoutRequestID"""
+    if _apply_callbacks({callback['checkout_request_id']: callback}):
+        raise RetryJob(f"Transaction {callback['checkout_request_id']} not recorded yet")
+
+def drop_unmatched_callback(checkout_request_id, error):
+    db.session.rollback()
+    print(f"Dropping callback for unknown transaction {checkout_request_id}: {str(error)}")
+
+def _apply_callbacks(by_checkout_id):
+    """Apply callbacks by CheckoutRequestID and commit.
+
+    Returns the CheckoutRequestIDs no transaction has been given yet;
+    send_stk_push may still be about to record them.
+    """
+    transactions = PaymentTransaction.query.filter(
+        PaymentTransaction.checkout_request_id.in_(list(by_checkout_id)),
+        PaymentTransaction.status.in_(['queued', 'pending'])
+    ).with_for_update().all()
+    
+    missing = set(by_checkout_id) - {transaction.checkout_request_id for transaction in transactions}
+    processed = {
+        checkout_request_id for (checkout_request_id,) in
+        db.session.query(PaymentTransaction.checkout_request_id).filter(
+            PaymentTransaction.checkout_request_id.in_(list(missing))
+        )
+    } if missing else set()
+    for checkout_request_id in processed:
+        print(f"Transaction {checkout_request_id} already processed.")
+    
+    paid_order_ids = []
+    for transaction in transactions:
+        callback = by_checkout_id[transaction.checkout_request_id]
+        
+        # Update transaction status based on the callback
+        if callback['result_code'] == 0:
+            transaction.status = 'completed'
+            if transaction.order_id:
+                paid_order_ids.append(transaction.order_id)
+            print(f"Transaction {transaction.checkout_request_id} completed successfully.")
+        else:
+            transaction.status = 'failed'
+            print(f"Transaction {transaction.checkout_request_id} failed. Result Description: {callback['result_desc']}")
+        
+        transaction.result_code = callback['result_code']
+        transaction.result_desc = callback['result_desc']
+    
+    if paid_order_ids:
+        Order.query.filter(
+            Order.order_id.in_(paid_order_ids),
+            Order.status == 'Pending'
+        ).update({'status': 'Processing', 'updated_at': datetime.utcnow()}, synchronize_session=False)
+    
+    db.session.commit()
+    return missing - processed
+
+# Callbacks are acknowledged immediately and written in micro-batches
+callback_batcher = MicroBatcher('mpesa-callbacks', apply_callbacks, max_batch=100, max_wait=0.05)
+
+# A callback can beat send_stk_push's commit of the CheckoutRequestID it
+# names; such callbacks are retried with backoff until the transaction
+# shows up (about a minute at most)
+UNMATCHED_CALLBACK_ATTEMPTS = 6
+unmatched_callback_queue = JobQueue('mpesa-unmatched-callbacks', workers=1,
+                                    max_attempts=UNMATCHED_CALLBACK_ATTEMPTS,
+                                    base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY)
+
 @mpesa_routes.route('/status/<checkout_request_id>', methods=['GET'])
 def check_payment_status(checkout_request_id):
-    """Check the status of an M-Pesa payment"""
+    """Check the status of an M-Pesa payment by our reference or M-Pesa's CheckoutRequestID"""
     try:
-        if checkout_request_id in TRANSACTIONS:
-            transaction = TRANSACTIONS[checkout_request_id]
+        transaction = PaymentTransaction.query.filter(or_(
+            PaymentTransaction.reference == checkout_request_id,
+            PaymentTransaction.checkout_request_id == checkout_request_id
+        )).first()
+        if transaction:
             return jsonify({
                 'success': True,
-                'status': transaction['status'],
-                'message': f'Transaction status is {transaction["status"]}'
+                'status': transaction.status,
+                'message': f'Transaction status is {transaction.status}'
             })
         else:
             return jsonify({
@@ -234,18 +405,101 @@ def check_payment_status(checkout_request_id):
             'message': f'An error occurred: {str(e)}'
         }), 500
 
+def mpesa_request(method, path, latency_histogram, **kwargs):
+    """Send a request to Daraja over the shared session, guarded by the circuit breaker.
+
+    5xx responses and request errors (timeouts, refused connections) count as failures; once the
+    breaker opens, calls raise CircuitOpenError without touching the network.
+    """
+    if not mpesa_breaker.allow_request():
+        raise CircuitOpenError("M-Pesa service is temporarily unavailable (circuit open)")
+    
+    started = time.perf_counter()
+    try:
+        response = http_session.request(
+            method, f"{API_BASE_URL}{path}",
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            verify=True,  # Enable SSL verification
+            **kwargs
+        )
+    except Exception:
+        mpesa_breaker.record_failure()
+        raise
+    finally:
+        latency_histogram.observe(time.perf_counter() - started)
+    
+    if response.status_code >= 500:
+        mpesa_breaker.record_failure()
+    else:
+        mpesa_breaker.record_success()
+    return response
+
+def purge_expired_transactions(ttl_days=TRANSACTION_TTL_DAYS):
+    """Delete transactions older than ttl_days in small batches; returns the number removed"""
+    cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+    removed = 0
+    
+    while True:
+        # Delete by primary key in batches so no single statement holds locks for long
+        expired_ids = [row.transaction_id for row in db.session.query(PaymentTransaction.transaction_id).filter(
+            PaymentTransaction.created_at < cutoff
+        ).limit(PURGE_BATCH_SIZE)]
+        
+        if not expired_ids:
+            break
+        
+        PaymentTransaction.query.filter(
+            PaymentTransaction.transaction_id.in_(expired_ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        removed += len(expired_ids)
+    
+    return removed
+
 def get_access_token():
-    """Get M-Pesa API access token"""
+    """Get M-Pesa API access token, reusing the cached one until shortly before it expires"""
+    token = _valid_cached_token()
+    if token:
+        TOKEN_CACHE_HITS.inc()
+        return {'access_token': token}
+    
+    # Only one thread refreshes; the others wait here and then reuse its token
+    with _token_lock:
+        token = _valid_cached_token()
+        if token:
+            TOKEN_CACHE_HITS.inc()
+            return {'access_token': token}
+        
+        result = request_access_token()
+        if 'access_token' in result:
+            TOKEN_REFRESHES.inc()
+            _cached_token['access_token'] = result['access_token']
+            _cached_token['expires_at'] = time.monotonic() + result['expires_in'] - TOKEN_REFRESH_MARGIN
+            return {'access_token': result['access_token']}
+        
+        return result
+
+def invalidate_access_token():
+    """Drop the cached access token so the next call fetches a new one"""
+    with _token_lock:
+        _cached_token['access_token'] = None
+        _cached_token['expires_at'] = 0.0
+
+def _valid_cached_token():
+    if _cached_token['access_token'] and time.monotonic() < _cached_token['expires_at']:
+        return _cached_token['access_token']
+    return None
+
+def request_access_token():
+    """Fetch a new access token from the M-Pesa OAuth endpoint"""
     try:
         credentials = base64.b64encode(f"{CONSUMER_KEY}:{CONSUMER_SECRET}".encode()).decode('utf-8')
         
-        response = requests.get(
-            f"{API_BASE_URL}{AUTH_ENDPOINT}?grant_type=client_credentials",
+        response = mpesa_request(
+            'GET', f"{AUTH_ENDPOINT}?grant_type=client_credentials", OAUTH_REQUEST_SECONDS,
             headers={
                 "Authorization": f"Basic {credentials}"
-            },
-            timeout=30,
-            verify=True  # Enable SSL verification
+            }
         )
         
         if response.status_code != 200:
@@ -259,7 +513,13 @@ def get_access_token():
                 'error': f"No access token in response: {data}"
             }
             
-        return {'access_token': data.get('access_token')}
+        # Daraja sends expires_in as a string of seconds (normally 3599)
+        return {
+            'access_token': data.get('access_token'),
+            'expires_in': int(data.get('expires_in', 3599))
+        }
+    except CircuitOpenError as e:
+        return {'error': str(e)}
     except requests.exceptions.ConnectionError as e:
         print(f"Connection error: {str(e)}")
         return {'error': f"Connection error: {str(e)}"}
@@ -0,0 +1,63 @@
+import itertools
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+# Caches that must drop entries when the rows behind them change register
+# here. Written rows are recorded as each flush happens and reported only
+# once the transaction commits, so other requests never refill a cache from
+# data that is about to change; a rollback forgets them. Work that must be
+# part of the write itself registers with on_write_of() instead.
+
+_listener_ids = itertools.count()
+
+def on_commit_of(models, callback):
+    """Call callback(written) after every commit that wrote any of models.
+
+    models is a model class or tuple of them. written is the set of
+    (model class, primary key) pairs inserted, updated or deleted by the
+    transaction.
+    """
+    info_key = f'written:{next(_listener_ids)}'
+
+    @event.listens_for(Session, 'after_flush')
+    def _collect(session, flush_context):
+        for instance in itertools.chain(session.new, session.dirty, session.deleted):
+            if isinstance(instance, models):
+                primary_key = inspect(instance).mapper.primary_key_from_instance(instance)
+                session.info.setdefault(info_key, set()).add((type(instance), primary_key[0]))
+
+    @event.listens_for(Session, 'after_commit')
+    def _on_commit(session):
+        written = session.info.pop(info_key, None)
+        if written:
+            callback(written)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _on_rollback(session):
+        session.info.pop(info_key, None)
+
+def on_write_of(models, callback):
+    """Call callback(session) inside each transaction that writes any of models.
+
+    It runs once per transaction, after the first flush that writes one of
+    them, so anything it executes commits or rolls back with the write.
+    """
+    info_key = f'wrote:{next(_listener_ids)}'
+
+    @event.listens_for(Session, 'after_flush')
+    def _on_flush(session, flush_context):
+        if info_key in session.info:
+            return
+        for instance in itertools.chain(session.new, session.dirty, session.deleted):
+            if isinstance(instance, models):
+                session.info[info_key] = True
+                callback(session)
+                return
+
+    @event.listens_for(Session, 'after_commit')
+    def _on_commit(session):
+        session.info.pop(info_key, None)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _on_rollback(session):
+        session.info.pop(info_key, None)
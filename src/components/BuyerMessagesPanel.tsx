@@ -65,6 +65,23 @@ const BuyerMessagesPanel = ({ isOpen, onClose, userEmail }: BuyerMessagesPanelPr
     }
   }, [isOpen, userEmail]);
 
+  // While open, seller replies are pushed instead of polled
+  useEffect(() => {
+    if (!isOpen || !userEmail) return;
+    
+    const source = new EventSource(
+      `http://localhost:5000/api/user/messages/stream?email=${encodeURIComponent(userEmail)}`,
+      { withCredentials: true }
+    );
+    
+    source.addEventListener('reply', (event) => {
+      const { messageId, reply, repliedAt } = JSON.parse((event as MessageEvent).data);
+      setMessages((prev) => prev.map((msg) => msg.id === messageId ? { ...msg, reply, repliedAt } : msg));
+    });
+    
+    return () => source.close();
+  }, [isOpen, userEmail]);
+
   if (!isOpen) return null;
 
   return (
@@ -29,6 +29,12 @@ const ProductCard = ({ product, onAddToCart }: ProductCardProps) => {
     ? `http://localhost:5000${product.image}` 
     : product.image;
   
+  // Same fix for each URL in a srcset ("url 640w, url 1280w")
+  const fixSrcSet = (srcSet?: string | null) => srcSet
+    ?.split(', ')
+    .map(entry => entry.startsWith('/static') ? `http://localhost:5000${entry}` : entry)
+    .join(', ');
+  
   const videoUrl = product.video?.startsWith('/static') 
     ? `http://localhost:5000${product.video}` 
     : product.video;
@@ -66,12 +72,20 @@ const ProductCard = ({ product, onAddToCart }: ProductCardProps) => {
     if (hasImage) {
       return (
         <div className="aspect-square w-full overflow-hidden relative">
-          <img
-            src={imageUrl}
-            alt={product.name}
-            className="h-full w-full object-cover transition-transform duration-300 hover:scale-105"
-            onError={(e) => console.error('Image load error:', e)}
-          />
+          <picture className="block h-full w-full">
+            {product.imageAvifSrcSet && (
+              <source type="image/avif" srcSet={fixSrcSet(product.imageAvifSrcSet)} sizes="(min-width: 768px) 33vw, 100vw" />
+            )}
+            <img
+              src={imageUrl}
+              srcSet={fixSrcSet(product.imageSrcSet)}
+              sizes="(min-width: 768px) 33vw, 100vw"
+              alt={product.name}
+              loading="lazy"
+              className="h-full w-full object-cover transition-transform duration-300 hover:scale-105"
+              onError={(e) => console.error('Image load error:', e)}
+            />
+          </picture>
           {hasVideo && (
             <button
               onClick={() => setShowVideo(true)}
@@ -3,6 +3,7 @@ import { useState, useEffect } from "react";
 import { Button } from "@/components/ui/button";
 import { categories, products as sampleProducts } from "@/data/products";
 import ProductCard from "./ProductCard";
+import { searchProducts, fetchCategoryCounts } from "@/utils/products";
 import { Loader2 } from "lucide-react";
 
 interface ProductsSectionProps {
@@ -10,57 +11,102 @@ interface ProductsSectionProps {
   onAddToCart: (product: any) => void;
 }
 
+// Wait for typing to pause before searching
+const SEARCH_DEBOUNCE_MS = 300;
+
+// Point uploaded media at the API server
+const withServerImage = (product: any) => {
+  if (product.image && product.image.startsWith('/static')) {
+    return {
+      ...product,
+      image: `http://localhost:5000${product.image}`
+    };
+  }
+  return product;
+};
+
+// Sample products shown if the API is unreachable, filtered the way the server would
+const filterSampleProducts = (query: string, category: string | null) =>
+  sampleProducts.filter((product) =>
+    (category ? product.category === category : true) &&
+    (query
+      ? product.name.toLowerCase().includes(query.toLowerCase()) ||
+        product.description.toLowerCase().includes(query.toLowerCase())
+      : true)
+  );
+
 const ProductsSection = ({ searchQuery, onAddToCart }: ProductsSectionProps) => {
   const [selectedCategory, setSelectedCategory] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
-  const [products, setProducts] = useState(sampleProducts);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [products, setProducts] = useState<any[]>([]);
+  const [nextPage, setNextPage] = useState<number | null>(null);
+  const [debouncedQuery, setDebouncedQuery] = useState(searchQuery.trim());
+  const [categoryCounts, setCategoryCounts] = useState<Record<string, number>>({});
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  useEffect(() => {
+    fetchCategoryCounts()
+      .then(setCategoryCounts)
+      .catch((error) => console.error("Error fetching category counts:", error));
+  }, []);
 
+  // Search and category filtering run on the server; load the first page
+  // again whenever either changes, dropping responses that arrive late
   useEffect(() => {
+    const controller = new AbortController();
+    
     const fetchProducts = async () => {
+      setIsLoading(true);
       try {
-        const response = await fetch('http://localhost:5000/api/products');
-        const data = await response.json();
+        const data = await searchProducts(debouncedQuery, selectedCategory, 1, { signal: controller.signal });
         
         if (data.success) {
-          // Process images in products
-          const processedProducts = data.products.map((product: any) => {
-            if (product.image && product.image.startsWith('/static')) {
-              return {
-                ...product,
-                image: `http://localhost:5000${product.image}`
-              };
-            }
-            return product;
-          });
-          
-          setProducts(processedProducts);
+          setProducts(data.products.map(withServerImage));
+          setNextPage(data.nextPage);
         } else {
           // Fallback to sample products if API fails
-          setProducts(sampleProducts);
+          setProducts(filterSampleProducts(debouncedQuery, selectedCategory));
+          setNextPage(null);
         }
       } catch (error) {
+        if (controller.signal.aborted) return;
         console.error("Error fetching products:", error);
         // Fallback to sample products if API fails
-        setProducts(sampleProducts);
-      } finally {
+        setProducts(filterSampleProducts(debouncedQuery, selectedCategory));
+        setNextPage(null);
+      }
+      if (!controller.signal.aborted) {
         setIsLoading(false);
       }
     };
     
     fetchProducts();
-  }, []);
+    return () => controller.abort();
+  }, [debouncedQuery, selectedCategory]);
 
-  // Filter products based on search query and selected category
-  const filteredProducts = products
-    .filter((product) => 
-      (selectedCategory ? product.category === selectedCategory : true) &&
-      (searchQuery
-        ? product.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-          product.description.toLowerCase().includes(searchQuery.toLowerCase())
-        : true)
-    );
+  const loadMore = async () => {
+    if (nextPage === null) return;
+    setIsLoadingMore(true);
+    try {
+      const data = await searchProducts(debouncedQuery, selectedCategory, nextPage);
+      if (data.success) {
+        setProducts((current) => [...current, ...data.products.map(withServerImage)]);
+        setNextPage(data.nextPage);
+      }
+    } catch (error) {
+      console.error("Error fetching more products:", error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
-  if (isLoading) {
+  // Keep showing the current products while a new search loads
+  if (isLoading && products.length === 0) {
     return (
       <section id="products-section" className="container py-16">
         <div className="flex min-h-[400px] items-center justify-center">
@@ -99,18 +145,30 @@ const ProductsSection = ({ searchQuery, onAddToCart }: ProductsSectionProps) =>
             className={selectedCategory === category ? "bg-sage-600 hover:bg-sage-700" : ""}
           >
             {category}
+            {categoryCounts[category] !== undefined && (
+              <span className="ml-1 text-xs opacity-70">({categoryCounts[category]})</span>
+            )}
           </Button>
         ))}
       </div>
 
       {/* Products grid */}
       <div className="grid gap-6 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4">
-        {filteredProducts.map((product) => (
+        {products.map((product) => (
           <ProductCard key={product.id} product={product} onAddToCart={onAddToCart} />
         ))}
       </div>
 
-      {filteredProducts.length === 0 && (
+      {nextPage !== null && (
+        <div className="mt-8 flex justify-center">
+          <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+            {isLoadingMore && <Loader2 className="mr-2 h-4 w-4 animate-spin" />}
+            Load more
+          </Button>
+        </div>
+      )}
+
+      {products.length === 0 && !isLoading && (
         <div className="flex min-h-[200px] flex-col items-center justify-center rounded-lg border-2 border-dashed border-gray-200 p-8 text-center">
           <p className="mb-2 text-lg font-semibold text-gray-900">No products found</p>
           <p className="text-sm text-gray-500">
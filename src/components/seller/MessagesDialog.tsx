@@ -17,6 +17,7 @@ interface Message {
   senderEmail: string;
   content: string;
   productName: string;
+  isRead: boolean;
   createdAt: string;
   reply?: string;
   repliedAt?: string;
@@ -30,15 +31,44 @@ interface MessagesDialogProps {
 
 const MessagesDialog = ({ open, onOpenChange, onMessagesLoaded }: MessagesDialogProps) => {
   const [messages, setMessages] = useState<Message[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [selectedMessage, setSelectedMessage] = useState<Message | null>(null);
   const [showReplyDialog, setShowReplyDialog] = useState(false);
   const { toast } = useToast();
 
-  const fetchMessages = async () => {
+  // Mark the messages just shown as read and report the remaining unread count
+  const markRead = async (loaded: Message[]) => {
+    const unreadIds = loaded.filter((msg) => !msg.isRead).map((msg) => msg.id);
+    if (unreadIds.length === 0) return;
+    
+    try {
+      const response = await fetch('http://localhost:5000/api/seller/messages/mark-read', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        credentials: 'include',
+        body: JSON.stringify({ messageIds: unreadIds })
+      });
+      
+      const data = await response.json();
+      
+      if (data.success) {
+        onMessagesLoaded?.(data.unreadCount);
+      }
+    } catch (error) {
+      console.error("Error marking messages read:", error);
+    }
+  };
+
+  const fetchMessages = async (cursor: string | null = null) => {
     setIsLoading(true);
     try {
-      const response = await fetch('http://localhost:5000/api/seller/messages', {
+      const url = cursor
+        ? `http://localhost:5000/api/seller/messages?cursor=${encodeURIComponent(cursor)}`
+        : 'http://localhost:5000/api/seller/messages';
+      const response = await fetch(url, {
         method: 'GET',
         credentials: 'include'
       });
@@ -46,9 +76,10 @@ const MessagesDialog = ({ open, onOpenChange, onMessagesLoaded }: MessagesDialog
       const data = await response.json();
       
       if (data.success) {
-        setMessages(data.messages || []);
-        const unreadCount = data.messages?.filter((msg: Message) => !msg.reply).length || 0;
-        onMessagesLoaded?.(unreadCount);
+        const loaded: Message[] = data.messages || [];
+        setMessages((prev) => cursor ? [...prev, ...loaded] : loaded);
+        setNextCursor(data.next_cursor || null);
+        markRead(loaded);
       } else {
         toast({
           title: "Error",
@@ -74,6 +105,28 @@ const MessagesDialog = ({ open, onOpenChange, onMessagesLoaded }: MessagesDialog
     }
   }, [open]);
 
+  // While open, new messages and replies are pushed instead of polled
+  useEffect(() => {
+    if (!open) return;
+    
+    const source = new EventSource('http://localhost:5000/api/seller/messages/stream', {
+      withCredentials: true
+    });
+    
+    source.addEventListener('message', (event) => {
+      const { message } = JSON.parse((event as MessageEvent).data);
+      setMessages((prev) => prev.some((msg) => msg.id === message.id) ? prev : [message, ...prev]);
+      markRead([message]);
+    });
+    
+    source.addEventListener('reply', (event) => {
+      const { messageId, reply, repliedAt } = JSON.parse((event as MessageEvent).data);
+      setMessages((prev) => prev.map((msg) => msg.id === messageId ? { ...msg, reply, repliedAt } : msg));
+    });
+    
+    return () => source.close();
+  }, [open]);
+
   const handleReply = (message: Message) => {
     setSelectedMessage(message);
     setShowReplyDialog(true);
@@ -83,6 +136,12 @@ const MessagesDialog = ({ open, onOpenChange, onMessagesLoaded }: MessagesDialog
     fetchMessages(); // Refresh messages after reply
   };
 
+  const handleLoadMore = () => {
+    if (nextCursor) {
+      fetchMessages(nextCursor);
+    }
+  };
+
   return (
     <>
       <Dialog open={open} onOpenChange={onOpenChange}>
@@ -92,7 +151,7 @@ const MessagesDialog = ({ open, onOpenChange, onMessagesLoaded }: MessagesDialog
           </DialogHeader>
           
           <div className="flex-1 overflow-auto space-y-4">
-            {isLoading ? (
+            {isLoading && messages.length === 0 ? (
               <div className="text-center py-8">Loading messages...</div>
             ) : messages.length === 0 ? (
               <div className="text-center py-8 text-gray-500">
@@ -137,6 +196,14 @@ const MessagesDialog = ({ open, onOpenChange, onMessagesLoaded }: MessagesDialog
                 </div>
               ))
             )}
+            
+            {nextCursor && (
+              <div className="text-center">
+                <Button variant="outline" onClick={handleLoadMore} disabled={isLoading}>
+                  {isLoading ? 'Loading...' : 'Load more'}
+                </Button>
+              </div>
+            )}
           </div>
         </DialogContent>
       </Dialog>
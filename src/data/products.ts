@@ -6,6 +6,8 @@ export interface Product {
   price: number;
   description: string;
   image: string;
+  imageSrcSet?: string | null;
+  imageAvifSrcSet?: string | null;
   video?: string;
   mediaType?: 'image' | 'video' | 'both';
   stock: number;
@@ -17,6 +17,8 @@ const Checkout = () => {
   const [paymentDialogOpen, setPaymentDialogOpen] = useState(false);
   const [paymentError, setPaymentError] = useState("");
   const [isServerConfigError, setIsServerConfigError] = useState(false);
+  // Order created for this checkout, reused if the payment request is retried
+  const [pendingOrder, setPendingOrder] = useState<Order | null>(null);
   const { toast } = useToast();
   const navigate = useNavigate();
   const { cart, clearCart } = useCart();
@@ -71,9 +73,9 @@ const Checkout = () => {
       if (result.success) {
         console.log("Order saved to backend successfully");
         
-        // Create order for frontend context
+        // Order for the frontend context, with the total the server charged
         const frontendOrder: Order = {
-          id: orderData.order_id,
+          id: result.orderId,
           items: cart.map(item => ({
             id: item.id,
             name: item.name,
@@ -84,16 +86,11 @@ const Checkout = () => {
           })),
           status: "Pending",
           date: new Date().toISOString(),
-          total: cartTotal,
+          total: result.total,
           userId: Number(userId)
         };
-
-        // Add to orders context
-        await addOrder(frontendOrder);
-        
-        // Clear cart
-        clearCart();
         
+        setPendingOrder(frontendOrder);
         return frontendOrder;
       } else {
         throw new Error(result.message || 'Failed to create order');
@@ -122,16 +119,23 @@ const Checkout = () => {
     setIsProcessing(true);
     
     try {
-      const amount = cartTotal; // Use actual cart total
+      // Create the order first so the payment is linked to it and the
+      // callback can move it on once M-Pesa confirms
+      const order = pendingOrder ?? await createOrder();
+      if (!order) return;
+      
+      const amount = Math.ceil(order.total); // M-Pesa takes whole shillings
       
       toast({
         title: "Processing",
         description: "Sending payment request...",
       });
       
-      const result = await initiateSTKPush(phoneNumber, amount);
+      const result = await initiateSTKPush(phoneNumber, amount, order.id);
       
       if (result.success) {
+        setPendingOrder(null);
+        
         toast({
           title: "Payment Initiated",
           description: "Please check your phone for the M-Pesa payment prompt and enter your PIN",
@@ -150,25 +154,17 @@ const Checkout = () => {
         // In a production app, you would poll the server to check payment status
         // For simplicity, we're simulating a successful payment after a delay
         setTimeout(async () => {
-          try {
-            // Create the order
-            await createOrder();
-            
-            toast({
-              title: "Payment Successful",
-              description: "Your order has been placed successfully!",
-            });
-            
-            // Redirect to homepage after successful payment
-            setTimeout(() => navigate('/'), 2000);
-          } catch (orderError) {
-            console.error("Order creation failed:", orderError);
-            toast({
-              title: "Order Creation Failed",
-              description: "Payment successful but order creation failed. Please contact support.",
-              variant: "destructive",
-            });
-          }
+          // Add to orders context and clear the cart
+          await addOrder(order);
+          clearCart();
+          
+          toast({
+            title: "Payment Successful",
+            description: "Your order has been placed successfully!",
+          });
+          
+          // Redirect to homepage after successful payment
+          setTimeout(() => navigate('/'), 2000);
         }, 5000);
       } else {
         // Check if it's a server configuration error
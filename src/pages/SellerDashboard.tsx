@@ -55,7 +55,7 @@ const SellerDashboard = () => {
   
   const fetchMessageCount = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/seller/messages/count', {
+      const response = await fetch('http://localhost:5000/api/seller/messages/unread-count', {
         method: 'GET',
         credentials: 'include'
       });
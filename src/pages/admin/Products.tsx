@@ -7,6 +7,7 @@ import { ArrowLeft, Trash2, Search } from "lucide-react";
 import { useNavigate } from "react-router-dom";
 import { useToast } from "@/hooks/use-toast";
 import { Input } from "@/components/ui/input";
+import { fetchAllProducts } from "@/utils/products";
 
 interface Product {
   id: string;
@@ -27,13 +28,11 @@ export default function Products() {
   
   const fetchProducts = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/products', {
+      const data = await fetchAllProducts({
         method: 'GET',
         credentials: 'include'
       });
       
-      const data = await response.json();
-      
       if (data.success) {
         setProducts(data.products || []);
       } else {
@@ -5,10 +5,11 @@
  * Initiates an M-Pesa STK push to the provided phone number
  * 
  * @param phoneNumber The phone number to send the STK push to (format: 254XXXXXXXXX)
- * @param amount Amount to be paid
+ * @param amount Amount to be paid, in whole shillings
+ * @param orderId Order being paid for; the server checks amount against its total
  * @returns Promise with the payment response
  */
-export const initiateSTKPush = async (phoneNumber: string, amount: number): Promise<{
+export const initiateSTKPush = async (phoneNumber: string, amount: number, orderId?: string): Promise<{
   success: boolean;
   message: string;
   checkoutRequestID?: string;
@@ -31,7 +32,8 @@ export const initiateSTKPush = async (phoneNumber: string, amount: number): Prom
       },
       body: JSON.stringify({
         phoneNumber: formattedPhone,
-        amount: amount
+        amount: amount,
+        orderId: orderId
       }),
       credentials: 'include'
     });
@@ -98,7 +100,7 @@ export const initiateSTKPush = async (phoneNumber: string, amount: number): Prom
  */
 export const checkPaymentStatus = async (checkoutRequestID: string): Promise<{
   success: boolean;
-  status: 'pending' | 'completed' | 'failed';
+  status: 'queued' | 'pending' | 'completed' | 'failed';
   message: string;
 }> => {
   try {
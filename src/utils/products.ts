@@ -0,0 +1,91 @@
+
+// Utility functions for loading and searching the product catalogue
+
+/**
+ * Fetches every product by following the API's next_cursor pages
+ * 
+ * /api/products returns one page (newest first) per request, so callers
+ * that need the whole catalogue must keep requesting until next_cursor is null.
+ * 
+ * @param init Optional fetch options (e.g. credentials)
+ * @returns Promise with all products, or success false if any page failed
+ */
+export const fetchAllProducts = async (init?: RequestInit): Promise<{
+  success: boolean;
+  products: any[];
+}> => {
+  const products: any[] = [];
+  let cursor: string | null = null;
+  
+  do {
+    const url = cursor
+      ? `http://localhost:5000/api/products?limit=100&cursor=${encodeURIComponent(cursor)}`
+      : 'http://localhost:5000/api/products?limit=100';
+    const response = await fetch(url, init);
+    const data = await response.json();
+    
+    if (!data.success) {
+      return { success: false, products };
+    }
+    
+    products.push(...(data.products || []));
+    cursor = data.next_cursor || null;
+  } while (cursor);
+  
+  return { success: true, products };
+};
+
+/**
+ * Fetches one page of a catalogue search from /api/products/search
+ * 
+ * Matching and category filtering run on the server, so only the page
+ * being shown is downloaded.
+ * 
+ * @param query Search text (empty for the newest products)
+ * @param category Category to filter by, or null for all
+ * @param page 1-based page number; the response's next_page is the one after it, if any
+ * @param init Optional fetch options (e.g. an abort signal)
+ * @returns Promise with the page of products and the next page number
+ */
+export const searchProducts = async (
+  query: string,
+  category: string | null,
+  page = 1,
+  init?: RequestInit
+): Promise<{
+  success: boolean;
+  products: any[];
+  nextPage: number | null;
+}> => {
+  const params = new URLSearchParams({ q: query, page: String(page), limit: '24' });
+  if (category) {
+    params.set('category', category);
+  }
+  
+  const response = await fetch(`http://localhost:5000/api/products/search?${params}`, init);
+  const data = await response.json();
+  
+  return {
+    success: Boolean(data.success),
+    products: data.products || [],
+    nextPage: data.next_page ?? null
+  };
+};
+
+/**
+ * Fetches the number of products in each category from /api/products/facets
+ * 
+ * @returns Promise with a map of category name to product count
+ */
+export const fetchCategoryCounts = async (): Promise<Record<string, number>> => {
+  const response = await fetch('http://localhost:5000/api/products/facets');
+  const data = await response.json();
+  
+  const counts: Record<string, number> = {};
+  if (data.success) {
+    for (const { category, count } of data.categories) {
+      counts[category] = count;
+    }
+  }
+  return counts;
+};
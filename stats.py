@@ -0,0 +1,41 @@
+
+from sqlalchemy import func, select
+from models import db, User, SellerProfile, Product, Order
+from cache import TTLCache
+from session_events import on_commit_of
+
+# Seconds a dashboard snapshot may be served before it is recomputed
+DASHBOARD_STATS_TTL = 30
+
+_stats_cache = TTLCache(DASHBOARD_STATS_TTL)
+
+# Writes to these tables change the dashboard counts
+_COUNTED_MODELS = (User, SellerProfile, Product, Order)
+
+def get_dashboard_stats():
+    """Return admin dashboard counts, from cache or from one aggregate query"""
+    stats = _stats_cache.get('dashboard')
+    if stats is not None:
+        return stats
+
+    counts = db.session.execute(select(
+        select(func.count()).select_from(Product).scalar_subquery(),
+        select(func.count()).select_from(User).scalar_subquery(),
+        select(func.count()).select_from(SellerProfile).scalar_subquery(),
+        select(func.count()).select_from(Order).scalar_subquery()
+    )).one()
+    total_products, total_buyers, total_sellers, total_orders = counts
+
+    stats = {
+        'products': total_products,
+        'users': total_buyers + total_sellers,
+        'orders': total_orders
+    }
+    _stats_cache.set('dashboard', stats)
+    return stats
+
+def invalidate_dashboard_stats():
+    _stats_cache.clear()
+
+# Drop the snapshot only once the write is visible to other requests
+on_commit_of(_COUNTED_MODELS, lambda written: invalidate_dashboard_stats())
@@ -0,0 +1,29 @@
+from models import db, User, SellerProfile, Product, CartItem
+
+def test_update_cart_merges_repeated_products(app, client):
+    with app.app_context():
+        user = User(username='buyer', email='buyer@example.com', password_hash='x')
+        seller = SellerProfile(username='seller', email='seller@example.com', password_hash='x', business_name='Farm')
+        db.session.add_all([user, seller])
+        db.session.flush()
+        products = [
+            Product(name=name, description='d', price=10, stock=10, category='Eggs', seller_id=seller.seller_id)
+            for name in ('Tray', 'Crate')
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        user_id = user.user_id
+        tray, crate = (product.product_id for product in products)
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    response = client.post('/api/cart/update', json={'items': [
+        {'id': str(tray), 'quantity': 2},
+        {'id': str(crate), 'quantity': 1},
+        {'id': tray, 'quantity': 3},
+    ]})
+
+    assert response.get_json()['success']
+    with app.app_context():
+        quantities = {item.product_id: item.quantity for item in CartItem.query.filter_by(user_id=user_id)}
+    assert quantities == {tray: 5, crate: 1}
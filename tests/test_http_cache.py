@@ -0,0 +1,95 @@
+from concurrent.futures import Future
+
+import pytest
+from sqlalchemy import event
+
+import media_store
+import response_cache
+from http_cache import catalogue_version
+from models import db, SellerProfile, Product
+
+IMAGE_NAME = 'ab/cd/abcd' + '0' * 60 + '.jpg'
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    response_cache.response_cache = response_cache.LRUBackend()
+
+@pytest.fixture
+def product_id(app):
+    with app.app_context():
+        seller = SellerProfile(
+            username='seller', email='seller@example.com', password_hash='x',
+            business_name='Farm', approval_status='approved'
+        )
+        db.session.add(seller)
+        db.session.flush()
+        product = Product(
+            name='Layers', description='Point of lay', price=800, stock=5, category='Live Poultry',
+            seller_id=seller.seller_id, image_url=media_store.media_url(IMAGE_NAME)
+        )
+        db.session.add(product)
+        db.session.commit()
+        return product.product_id
+
+def revalidate(client, url, etag):
+    # Another worker, or the same one after the response cache expired
+    response_cache.response_cache = response_cache.LRUBackend()
+    return client.get(url, headers={'If-None-Match': etag})
+
+@pytest.mark.parametrize('url', ['/api/products', '/api/products/{id}'])
+def test_unchanged_catalogue_answers_304_from_the_version_alone(app, client, product_id, url):
+    url = url.format(id=product_id)
+    etag = client.get(url).headers['ETag'].strip('"')
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = revalidate(client, url, etag)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert response.status_code == 304
+    assert len(statements) == 1
+
+def test_every_product_write_moves_the_version(app, product_id):
+    with app.app_context():
+        before = catalogue_version()
+        product = db.session.get(Product, product_id)
+        product.stock = 4
+        db.session.commit()
+        product.stock = 3
+        db.session.commit()
+        assert catalogue_version() == before + 2
+
+def test_rolled_back_write_keeps_the_version(app, product_id):
+    with app.app_context():
+        before = catalogue_version()
+        db.session.get(Product, product_id).stock = 1
+        db.session.flush()
+        db.session.rollback()
+        assert catalogue_version() == before
+
+def test_seller_rename_changes_the_etag(app, client, product_id):
+    etag = client.get('/api/products').headers['ETag'].strip('"')
+    with app.app_context():
+        db.session.get(SellerProfile, 1).business_name = 'New Farm'
+        db.session.commit()
+
+    response = revalidate(client, '/api/products', etag)
+    assert response.status_code == 200
+    assert response.get_json()['products'][0]['sellerName'] == 'New Farm'
+
+def test_finished_variants_change_the_etag(app, client, product_id):
+    url = f'/api/products/{product_id}'
+    etag = client.get(url).headers['ETag'].strip('"')
+
+    future = Future()
+    future.set_result({'webp': [[320, 320], [640, 640]]})
+    media_store._variants_done(app, IMAGE_NAME, None, future)
+
+    response = revalidate(client, url, etag)
+    assert response.status_code == 200
+    assert response.get_json()['product']['image'] == media_store.media_url(IMAGE_NAME.replace('.jpg', '-640w.webp'))
@@ -0,0 +1,62 @@
+import pytest
+
+import media_store
+
+@pytest.fixture
+def upload_folder(app, tmp_path):
+    previous = app.config['UPLOAD_FOLDER']
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    (tmp_path / 'tmp').mkdir()
+    (tmp_path / 'tmp' / 'upload-secret').write_bytes(b'staged')
+    (tmp_path / 'x').mkdir()
+    (tmp_path / 'clip.mp4').write_bytes(b'0123456789')
+    yield tmp_path
+    app.config['UPLOAD_FOLDER'] = previous
+
+@pytest.mark.parametrize('name', [
+    'tmp/upload-secret',
+    './tmp/upload-secret',
+    'x/../tmp/upload-secret',
+    'tmp',
+])
+def test_staged_uploads_are_not_served(client, upload_folder, name):
+    assert client.get(f'/static/uploads/{name}').status_code == 404
+
+@pytest.mark.parametrize('name', ['clip.mp4', './clip.mp4', 'x/../clip.mp4'])
+def test_stored_media_is_served(client, upload_folder, name):
+    response = client.get(f'/static/uploads/{name}')
+    assert response.status_code == 200
+    assert response.get_data() == b'0123456789'
+    response.close()
+
+@pytest.mark.parametrize('header, status, body', [
+    ('bytes=2-4', 206, b'234'),
+    ('bytes=0-1,4-5', 200, b'0123456789'),
+    ('items=0-1', 200, b'0123456789'),
+    ('bytes=50-', 416, b''),
+])
+def test_range_requests(client, upload_folder, header, status, body):
+    response = client.get('/static/uploads/clip.mp4', headers={'Range': header})
+    assert response.status_code == status
+    assert response.get_data() == body
+    response.close()
+
+HASHED_IMAGE = 'ab/cd/abcd' + '1' * 60 + '.jpg'
+
+def test_legacy_uploads_have_no_variants(app, upload_folder):
+    # Named by date and filename, so never looked up on disk
+    (upload_folder / '20240101_120000_hen.variants.json').write_text('{"webp": [[320, 320]]}')
+    with app.app_context():
+        assert media_store.image_variants('20240101_120000_hen.jpg') is None
+
+def test_missing_manifest_is_remembered(app, upload_folder):
+    manifest = upload_folder / 'ab' / 'cd' / ('abcd' + '1' * 60 + '.variants.json')
+    with app.app_context():
+        assert media_store.image_variants(HASHED_IMAGE) is None
+
+        manifest.parent.mkdir(parents=True)
+        manifest.write_text('{"webp": [[320, 320]]}')
+        assert media_store.image_variants(HASHED_IMAGE) is None
+
+        media_store._missing_manifests.delete(HASHED_IMAGE)
+        assert media_store.image_variants(HASHED_IMAGE) == {'webp': [[320, 320]]}
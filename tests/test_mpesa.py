@@ -0,0 +1,69 @@
+import pytest
+
+import routes.mpesa as mpesa
+from models import db, User, Order, PaymentTransaction
+
+@pytest.fixture(autouse=True)
+def no_stk_push(monkeypatch):
+    sent = []
+    monkeypatch.setattr(mpesa.stk_push_queue, 'submit', lambda func, *args, **kwargs: sent.append(args))
+    return sent
+
+@pytest.fixture
+def buyer(app, client):
+    with app.app_context():
+        user = User(username='buyer', email='buyer@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Order(order_id='order-1', user_id=user.user_id, total=149.5))
+        db.session.commit()
+        user_id = user.user_id
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return user_id
+
+def stored_amounts(app):
+    with app.app_context():
+        return [transaction.amount for transaction in PaymentTransaction.query]
+
+@pytest.mark.parametrize('amount', [100, 100.0, '100'])
+def test_whole_amounts_are_stored_as_integers(app, client, amount):
+    response = client.post('/api/mpesa/stkpush', json={'phoneNumber': '254700000000', 'amount': amount})
+    assert response.status_code == 202
+    assert stored_amounts(app) == [100]
+
+@pytest.mark.parametrize('amount', [149.5, '12.25', 0, -5, 'abc', True, None])
+def test_other_amounts_are_rejected(app, client, amount):
+    response = client.post('/api/mpesa/stkpush', json={'phoneNumber': '254700000000', 'amount': amount})
+    assert response.status_code == 400
+    assert stored_amounts(app) == []
+
+def test_order_total_is_rounded_up(app, client, buyer):
+    response = client.post('/api/mpesa/stkpush', json={'phoneNumber': '254700000000', 'orderId': 'order-1'})
+    assert response.status_code == 202
+    assert stored_amounts(app) == [150]
+
+def test_order_amount_must_match_total(app, client, buyer):
+    response = client.post('/api/mpesa/stkpush', json={
+        'phoneNumber': '254700000000', 'orderId': 'order-1', 'amount': 1
+    })
+    assert response.status_code == 400
+    assert stored_amounts(app) == []
+
+def test_unknown_order_is_rejected(app, client, buyer):
+    response = client.post('/api/mpesa/stkpush', json={'phoneNumber': '254700000000', 'orderId': 'missing'})
+    assert response.status_code == 400
+
+def test_completed_callback_moves_linked_order_on(app, client, buyer):
+    client.post('/api/mpesa/stkpush', json={'phoneNumber': '254700000000', 'orderId': 'order-1'})
+    with app.app_context():
+        transaction = PaymentTransaction.query.one()
+        assert transaction.order_id == 'order-1'
+        transaction.checkout_request_id = 'ws_CO_1'
+        transaction.status = 'pending'
+        db.session.commit()
+
+        mpesa.apply_callbacks([{'checkout_request_id': 'ws_CO_1', 'result_code': 0, 'result_desc': 'Paid'}])
+
+        assert PaymentTransaction.query.one().status == 'completed'
+        assert db.session.get(Order, 'order-1').status == 'Processing'
@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor
+
+def _token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 1, 12, 30)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    assert decode_cursor(encode_cursor(created_at, 'a-uuid')) == (created_at, 'a-uuid')
+
+@pytest.mark.parametrize('payload', [
+    ['2024-01-01', {}],
+    ['2024-01-01', [1]],
+    ['2024-01-01', None],
+    ['2024-01-01', True],
+    [20240101, 1],
+    ['not a date', 1],
+    ['2024-01-01'],
+    {'created_at': '2024-01-01'},
+])
+def test_malformed_cursor_raises_value_error(payload):
+    with pytest.raises(ValueError):
+        decode_cursor(_token(payload))
+
+def test_products_answer_invalid_cursor(client):
+    response = client.get('/api/products?cursor=' + _token(['2024-01-01', {}]))
+    assert response.get_json() == {'success': False, 'message': 'Invalid cursor'}
@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import app_auth
+import response_cache
+from models import db, User, SellerProfile, AdminProfile, Product, CartItem
+
+# Catalogue, cart and report endpoints must run a fixed number of SQL
+# statements however many rows they return (no per-product seller lookups)
+
+@contextmanager
+def count_statements(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def seed(app, product_count, seller_count=20):
+    with app.app_context():
+        sellers = [
+            SellerProfile(
+                username=f'seller{i}', email=f'seller{i}@example.com', password_hash='x',
+                business_name=f'Farm {i}', approval_status='approved'
+            )
+            for i in range(seller_count)
+        ]
+        user = User(username='buyer', email='buyer@example.com', password_hash='x')
+        admin = AdminProfile(username='admin', email='admin@example.com', password_hash='x')
+        db.session.add_all(sellers + [user, admin])
+        db.session.flush()
+
+        created = datetime(2024, 1, 1)
+        products = [
+            Product(
+                name=f'Product {i}', description='Layers', price=100 + i, stock=10,
+                category='Live Poultry', seller_id=sellers[i % seller_count].seller_id,
+                created_at=created + timedelta(minutes=i)
+            )
+            for i in range(product_count)
+        ]
+        db.session.add_all(products)
+        db.session.flush()
+
+        # Fill the cart from many different sellers
+        db.session.add_all([
+            CartItem(user_id=user.user_id, product_id=product.product_id, quantity=1)
+            for product in products[:50]
+        ])
+        db.session.commit()
+        return user.user_id, admin.admin_id
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    response_cache.response_cache = response_cache.LRUBackend()
+    app_auth._profile_cache.clear()
+
+@pytest.mark.parametrize('product_count', [60, 500])
+def test_products_page_runs_constant_statements(app, client, product_count):
+    seed(app, product_count)
+
+    with count_statements(app) as statements:
+        response = client.get('/api/products?limit=50')
+
+    assert response.get_json()['success']
+    assert len(response.get_json()['products']) == 50
+    # Catalogue version for the ETag, then one page with sellers joined
+    assert len(statements) == 2
+
+@pytest.mark.parametrize('product_count', [60, 500])
+def test_cart_runs_constant_statements(app, client, product_count):
+    user_id, _ = seed(app, product_count)
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    with count_statements(app) as statements:
+        response = client.get('/api/cart')
+
+    assert response.get_json()['success']
+    assert len(response.get_json()['cart']) == 50
+    assert len(statements) == 1
+
+@pytest.mark.parametrize('product_count', [60, 500])
+def test_products_report_runs_constant_statements(app, client, product_count):
+    _, admin_id = seed(app, product_count)
+    with client.session_transaction() as session:
+        session['admin_id'] = admin_id
+
+    with count_statements(app) as statements:
+        response = client.get('/api/admin/reports/products/download')
+        body = response.get_data(as_text=True)
+
+    assert body.count('\n') == product_count + 1
+    # Admin profile, then the products with sellers joined
+    assert len(statements) == 2
@@ -0,0 +1,101 @@
+import pytest
+
+import response_cache
+from models import db, SellerProfile, Product
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis client methods RedisBackend uses"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expiry[key] = ex
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+class BrokenRedis:
+    def get(self, key):
+        raise ConnectionError('down')
+
+    set = delete = get
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(response_cache, 'response_cache', response_cache.RedisBackend(client))
+    return client
+
+@pytest.fixture
+def product_id(app):
+    with app.app_context():
+        seller = SellerProfile(
+            username='seller', email='seller@example.com', password_hash='x',
+            business_name='Farm', approval_status='approved'
+        )
+        db.session.add(seller)
+        db.session.flush()
+        product = Product(
+            name='Layers', description='Point of lay', price=800, stock=5,
+            category='Live Poultry', seller_id=seller.seller_id
+        )
+        db.session.add(product)
+        db.session.commit()
+        return product.product_id
+
+def test_redis_backend_round_trips_json_with_ttl(fake_redis):
+    backend = response_cache.response_cache
+    backend.set('products:detail:1', {'body': '{}', 'etag': 'abc'})
+
+    assert backend.get('products:detail:1') == {'body': '{}', 'etag': 'abc'}
+    assert fake_redis.expiry['kukuhub:products:detail:1'] == response_cache.RESPONSE_CACHE_TTL
+    backend.delete('products:detail:1')
+    assert backend.get('products:detail:1') is None
+
+def test_redis_errors_are_cache_misses():
+    backend = response_cache.RedisBackend(BrokenRedis())
+    backend.set('key', {'body': '', 'etag': ''})
+    backend.delete('key')
+    assert backend.get('key') is None
+
+def test_list_keys_move_to_a_new_generation_on_invalidation(fake_redis):
+    key = response_cache.product_list_key(50, None)
+    assert response_cache.product_list_key(50, None) == key
+
+    response_cache.invalidate_products([])
+
+    assert response_cache.product_list_key(50, None) != key
+
+def test_product_update_commit_evicts_detail_and_list_entries(app, client, fake_redis, product_id):
+    assert client.get('/api/products').status_code == 200
+    assert client.get(f'/api/products/{product_id}').status_code == 200
+    list_key = response_cache.product_list_key(50, None)
+    detail_key = response_cache.product_detail_key(product_id)
+    assert response_cache.response_cache.get(list_key) is not None
+    assert response_cache.response_cache.get(detail_key) is not None
+
+    with app.app_context():
+        db.session.get(Product, product_id).price = 900
+        db.session.commit()
+
+    assert response_cache.response_cache.get(detail_key) is None
+    assert response_cache.response_cache.get(response_cache.product_list_key(50, None)) is None
+    assert client.get(f'/api/products/{product_id}').get_json()['product']['price'] == 900
+    assert client.get('/api/products').get_json()['products'][0]['price'] == 900
+
+def test_rolled_back_update_keeps_cached_entries(app, client, fake_redis, product_id):
+    client.get(f'/api/products/{product_id}')
+    detail_key = response_cache.product_detail_key(product_id)
+
+    with app.app_context():
+        db.session.get(Product, product_id).price = 900
+        db.session.flush()
+        db.session.rollback()
+
+    assert response_cache.response_cache.get(detail_key) is not None
@@ -0,0 +1,36 @@
+from models import db, SellerProfile, Product
+
+def seed(app):
+    with app.app_context():
+        seller = SellerProfile(
+            username='seller', email='seller@example.com', password_hash='x',
+            business_name='Farm', approval_status='approved'
+        )
+        db.session.add(seller)
+        db.session.flush()
+        db.session.add_all([
+            Product(
+                name=f'Product {i}', description='Birds', price=100 + i, stock=10,
+                category='Live Poultry' if i % 2 else 'Eggs', seller_id=seller.seller_id
+            )
+            for i in range(30)
+        ])
+        db.session.commit()
+
+def test_search_pages_through_a_category(app, client):
+    seed(app)
+
+    seen = []
+    page = 1
+    while page:
+        data = client.get(f'/api/products/search?category=Eggs&limit=6&page={page}').get_json()
+        assert data['success']
+        assert all(product['category'] == 'Eggs' for product in data['products'])
+        seen.extend(product['id'] for product in data['products'])
+        page = data['next_page']
+
+    assert len(seen) == len(set(seen)) == 15
+
+def test_search_rejects_bad_parameters(app, client):
+    data = client.get('/api/products/search?page=two').get_json()
+    assert data == {'success': False, 'message': 'Invalid search parameters'}